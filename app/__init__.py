@@ -3,7 +3,12 @@ from flask import Flask
 from flask_jwt import JWT
 from flask_sqlalchemy import SQLAlchemy
 
-from .authentication import authenticate, identity
+from .authentication import authenticate, identity, init_identity_cache, jwt_payload
+from .caching import init_response_cache
+from .hashing import init_password_hasher
+from .instrumentation import init_query_stats
+from .json_provider import init_json_provider
+from .metrics import init_metrics
 
 db = SQLAlchemy()
 
@@ -14,8 +19,15 @@ def create_app(config_name):
   config[config_name].init_app(app)
 
   db.init_app(app)
-
-  JWT(app, authenticate, identity)
+  init_json_provider(app)
+
+  jwt = JWT(app, authenticate, identity)
+  jwt.jwt_payload_handler(jwt_payload)
+  init_identity_cache(app)
+  init_password_hasher(app)
+  init_response_cache(app)
+  init_query_stats(app)
+  init_metrics(app)
 
   from .api import api as api_blueprint
   app.register_blueprint(api_blueprint, url_prefix='/api')
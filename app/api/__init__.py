@@ -2,4 +2,4 @@ from flask import Blueprint
 
 api = Blueprint('api', __name__)
 
-from . import errors, players, teams, users, roles
+from . import errors, players, teams, users, roles, metrics
@@ -1,17 +1,46 @@
 from functools import wraps
 
-from flask import request
-from flask_jwt import current_identity
-from jsonschema import FormatChecker, ValidationError, validate
+import jwt
+from flask import _request_ctx_stack, current_app, g, make_response, request
+from flask_jwt import _jwt, _jwt_required, current_identity
+from jsonschema import FormatChecker, validators
+from jsonschema.exceptions import best_match
 
+from .. import db
+from ..authentication import identity_from_claims
+from ..caching import CacheError, get_generation, response_cache_key
+from ..metrics import RESPONSE_CACHE
+from ..models import Version
 from .errors import bad_request, forbidden
 
 
+def jwt_claims_required(realm=None):
+  # authorizes from the token claims alone, falling back to jwt_required's
+  # database backed identity when claims are missing or revoked
+  def decorator(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+      user_identity = None
+      token = _jwt.request_callback()
+      if token is not None:
+        try:
+          user_identity = identity_from_claims(_jwt.jwt_decode_callback(token))
+        except jwt.InvalidTokenError:
+          pass
+      if user_identity is None:
+        _jwt_required(realm or current_app.config['JWT_DEFAULT_REALM'])
+      else:
+        _request_ctx_stack.top.current_identity = user_identity
+      return f(*args, **kwargs)
+    return decorated_function
+  return decorator
+
+
 def admin_required():
   def decorator(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-      if not current_identity.role.administrator:
+      if not current_identity.administrator:
         return forbidden('insufficient permissions')
       return f(*args, **kwargs)
     return decorated_function
@@ -19,16 +48,79 @@ def admin_required():
 
 
 def validate_input(json_schema):
+  # compile validator once, when the endpoint is declared
+  validator_class = validators.validator_for(json_schema)
+  validator_class.check_schema(json_schema)
+  validator = validator_class(json_schema, format_checker=FormatChecker())
+
   def decorator(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-      try:
-        if not request.is_json:
-          return bad_request('only JSON content allowed')
-        validate(request.json, schema=json_schema,
-                 format_checker=FormatChecker())
-      except ValidationError as e:
-        return bad_request(e.message)
+      if not request.is_json:
+        return bad_request('only JSON content allowed')
+      error = best_match(validator.iter_errors(request.json))
+      if error:
+        return bad_request(error.message)
       return f(*args, **kwargs)
     return decorated_function
   return decorator
+
+
+def cached_response():
+  def decorator(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+      cache = current_app.extensions['response_cache']
+      if cache is None:
+        return f(*args, **kwargs)
+
+      # links in the body depend on the host, so entries remember it
+      key = response_cache_key(request.endpoint, **kwargs)
+      try:
+        generation = get_generation(cache, key)
+        entry = cache.get(key)
+      except CacheError as e:
+        current_app.logger.error('response cache lookup failed: %s', e)
+        RESPONSE_CACHE.labels(request.endpoint, 'error').inc()
+        return f(*args, **kwargs)
+      if generation is None:
+        return f(*args, **kwargs)
+      # versioned responses must match the version their etag comes from
+      version = g.get('response_version')
+      if entry is not None and entry[:3] == (generation, version, request.url_root):
+        RESPONSE_CACHE.labels(request.endpoint, 'hit').inc()
+        return current_app.response_class(entry[3], mimetype=entry[4])
+
+      RESPONSE_CACHE.labels(request.endpoint, 'miss').inc()
+      # end the current transaction, so the view can't read rows older than the generation
+      db.session.rollback()
+      response = make_response(f(*args, **kwargs))
+      if response.status_code == 200 and not response.is_streamed:
+        try:
+          cache.set(key, (generation, version, request.url_root, response.get_data(),
+                          response.mimetype))
+        except CacheError as e:
+          current_app.logger.error('response cache update failed: %s', e)
+      return response
+    return decorated_function
+  return decorator
+
+
+def versioned(name):
+  def decorator(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+      # tag comes from a version counter, so matches don't serialize anything
+      version_name = name.format(**kwargs)
+      etag = '%s-%d' % (version_name, Version.get(version_name))
+      if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+      else:
+        g.response_version = etag
+        response = make_response(f(*args, **kwargs))
+        if response.status_code != 200:
+          return response
+      response.set_etag(etag, weak=True)
+      return response
+    return decorated_function
+  return decorator
@@ -1,8 +1,8 @@
 import traceback
 
-from flask import jsonify
 from werkzeug.exceptions import BadRequest
 
+from ..json_provider import jsonify
 from . import api
 
 
@@ -41,6 +41,15 @@ def conflict(description):
   return response
 
 
+@api.app_errorhandler(503)
+def service_unavailable(e):
+  response = jsonify({'error': 'service unavailable', 'description': e.description})
+  response.status_code = 503
+  if e.retry_after:
+    response.headers['Retry-After'] = str(e.retry_after)
+  return response
+
+
 @api.app_errorhandler(500)
 @api.app_errorhandler(Exception)
 def internal_server_error(e):
@@ -0,0 +1,13 @@
+from flask_jwt import jwt_required
+
+from ..metrics import generate_metrics
+from . import api
+from .decorators import admin_required
+
+
+@api.route('/metrics')
+@jwt_required()
+@admin_required()
+def get_metrics():
+  data, content_type = generate_metrics()
+  return data, 200, {'Content-Type': content_type}
@@ -0,0 +1,29 @@
+from flask import current_app, request, url_for
+
+
+def paginate(query, model, endpoint, stream=False, **kwargs):
+  after = request.args.get('after', type=int)
+  limit = request.args.get(
+      'limit', current_app.config['SOCCER_PAGE_SIZE'], type=int)
+  limit = max(1, min(limit, current_app.config['SOCCER_MAX_PAGE_SIZE']))
+
+  if after is not None:
+    query = query.filter(model.id > after)
+
+  query = query.order_by(model.id)
+  if stream:
+    # probe page boundary on ids only, rows are streamed by the caller
+    ids = [id for id, in query.with_entities(model.id).offset(limit - 1).limit(2)]
+    last_id = ids[0] if len(ids) > 1 else None
+    items = query.limit(limit)
+  else:
+    # fetch one extra row to know if there is a next page
+    items = query.limit(limit + 1).all()
+    last_id = items[limit - 1].id if len(items) > limit else None
+    items = items[:limit]
+
+  headers = {}
+  if last_id is not None:
+    headers['Link'] = '<%s>; rel="next"' % url_for(
+        endpoint, after=last_id, limit=limit, _external=True, **kwargs)
+  return items, headers
@@ -1,24 +1,33 @@
-from flask import jsonify, request, url_for
+from flask import current_app, request, url_for
 from flask_jwt import current_identity, jwt_required
 
-from .. import db
-from ..models import Player, Team
-from ..utils import update_player_price
+from .. import db, transfers
+from ..json_provider import jsonify
+from ..models import Player, PlayerSearchToken, Team
 from . import api
-from .decorators import admin_required, validate_input
+from .decorators import (admin_required, cached_response, jwt_claims_required,
+                         validate_input, versioned)
 from .errors import conflict, forbidden, bad_request
+from .pagination import paginate
+from .streaming import stream_json
 
 
 @api.route('/players')
-@jwt_required()
+@jwt_claims_required()
 def get_players():
-  players = Player.query.all()
+  if current_app.config['SOCCER_STREAM_RESPONSES']:
+    players, headers = paginate(
+        Player.query, Player, 'api.get_players', stream=True)
+    return stream_json(players, lambda p: p.to_json()), 200, headers
+
+  players, headers = paginate(Player.query, Player, 'api.get_players')
   players = list(map(lambda p: p.to_json(), players))
-  return jsonify(players)
+  return jsonify(players), 200, headers
 
 
 @api.route('/players/<int:id>')
-@jwt_required()
+@jwt_claims_required()
+@cached_response()
 def get_player(id):
   player = Player.query.get_or_404(id)
   return jsonify(player.to_json())
@@ -110,12 +119,12 @@ def new_player():
 })
 def edit_player(id):
   player = Player.query.get_or_404(id)
-  if (player.team == None or player.team.user_id != current_identity.id) and not current_identity.role.administrator:
+  if (player.team == None or player.team.user_id != current_identity.id) and not current_identity.administrator:
     return forbidden('cannot edit this player')
 
   json_player = request.json
   if 'team_id' in json_player:
-    if not current_identity.role.administrator:
+    if not current_identity.administrator:
       return forbidden('cannot change player\'s team')
 
     team = Team.query.get(json_player['team_id'])
@@ -124,22 +133,22 @@ def edit_player(id):
     player.team_id = json_player['team_id']
 
   if 'value' in json_player:
-    if not current_identity.role.administrator:
+    if not current_identity.administrator:
       return forbidden('cannot update player\'s value')
     player.value = json_player['value']
 
   if 'age' in json_player:
-    if not current_identity.role.administrator:
+    if not current_identity.administrator:
       return forbidden('cannot update player\'s age')
     player.age = json_player['age']
 
   if 'price' in json_player:
-    if not current_identity.role.administrator:
+    if not current_identity.administrator:
       return forbidden('cannot update player\'s price')
     player.price = json_player['price']
 
   if 'offer' in json_player:
-    if not current_identity.role.administrator:
+    if not current_identity.administrator:
       return forbidden('cannot offer player')
     player.offer = json_player['offer']
 
@@ -171,26 +180,40 @@ def delete_player(id):
   return '', 204
 
 
-@api.route('/players/market')
-@jwt_required()
-def get_players_market():
+def get_market_query(args):
   query = Player.query.filter_by(offer=True)
 
-  if request.args.get('team'):
-    query = query.join(Team).filter(Team.name == request.args.get('team'))
+  if args.get('team'):
+    query = query.join(Team).filter(Team.name == args.get('team'))
 
-  if request.args.get('country'):
-    query = query.filter(Player.country == request.args.get('country'))
+  if args.get('country'):
+    query = query.filter(Player.country == args.get('country'))
 
-  if request.args.get('name'):
-    query = query.filter(Player.name.ilike('%%%s%%' % request.args.get(
-        'name')) | Player.lastname.ilike('%%%s%%' % request.args.get('name')))
+  if args.get('name'):
+    # trigram index narrows candidates, ILIKE keeps the exact matching rules
+    matches = PlayerSearchToken.search(args.get('name'))
+    if matches is not None:
+      query = query.filter(Player.id.in_(matches))
+    query = query.filter(Player.name.ilike('%%%s%%' % args.get(
+        'name')) | Player.lastname.ilike('%%%s%%' % args.get('name')))
 
-  if request.args.get('minPrice'):
-    query = query.filter(Player.price >= request.args.get('minPrice'))
+  if args.get('minPrice'):
+    query = query.filter(Player.price >= args.get('minPrice'))
 
-  if request.args.get('maxPrice'):
-    query = query.filter(Player.price <= request.args.get('maxPrice'))
+  if args.get('maxPrice'):
+    query = query.filter(Player.price <= args.get('maxPrice'))
+
+  return query
+
+
+@api.route('/players/market')
+@jwt_claims_required()
+@versioned('players')
+def get_players_market():
+  query = get_market_query(request.args)
+
+  if current_app.config['SOCCER_STREAM_RESPONSES']:
+    return stream_json(query, lambda p: p.to_json(show_price=True))
 
   players = query.all()
   players = list(map(lambda p: p.to_json(show_price=True), players))
@@ -235,33 +258,38 @@ def cancel_offer_player(id):
   return '', 204
 
 
+@api.route('/players/buy', methods=['POST'])
+@jwt_required()
+@validate_input(json_schema={
+    'type': 'object',
+    'properties': {
+        'players': {
+            'type': 'array',
+            'items': {
+                'type': 'integer'
+            },
+            'minItems': 1,
+            'maxItems': 100
+        }
+    },
+    'required': ['players']
+})
+def buy_players():
+  try:
+    results = transfers.buy_players(
+        request.json['players'], current_identity.id, current_identity.team_id)
+  except transfers.TransferError as e:
+    return bad_request(str(e))
+
+  return jsonify(results)
+
+
 @api.route('/players/<int:id>/buy', methods=['POST'])
 @jwt_required()
 def buy_player(id):
-  player = Player.query.get_or_404(id)
-  if not player.offer:
-    return bad_request('player is not in market')
-
-  if player.team and player.team.user_id == current_identity.id:
-    return bad_request('this player is already yours')
-
-  team_dest = current_identity.team
-  if not team_dest:
-    return bad_request('you don\'t own a team')
-
-  if player.price > team_dest.wallet:
-    return bad_request('you don\'t have enough money to buy this player')
-
-  team_orig = player.team
-  if team_orig:
-    team_orig.wallet += player.price
-    db.session.add(team_orig)
-  team_dest.wallet -= player.price
-  player.team = team_dest
-  player.value = update_player_price(player.value)
-  player.offer = False
-
-  db.session.add(player)
-  db.session.commit()
+  try:
+    transfers.buy_player(id, current_identity.id, current_identity.team_id)
+  except transfers.TransferError as e:
+    return bad_request(str(e))
 
   return '', 204
@@ -1,20 +1,22 @@
-from flask import jsonify
-from flask_jwt import jwt_required
-
+from ..json_provider import jsonify
 from ..models import Role
 from . import api
+from .decorators import jwt_claims_required
+from .errors import page_not_found
 
 
 @api.route('/roles')
-@jwt_required()
+@jwt_claims_required()
 def get_roles():
-  roles = Role.query.all()
+  roles = Role.registry().all()
   roles = list(map(lambda r: r.to_json(), roles))
   return jsonify(roles)
 
 
 @api.route('/roles/<int:id>')
-@jwt_required()
+@jwt_claims_required()
 def get_role(id):
-  role = Role.query.get_or_404(id)
+  role = Role.registry().get(id)
+  if role is None:
+    return page_not_found(None)
   return jsonify(role.to_json())
@@ -0,0 +1,27 @@
+from flask import current_app, stream_with_context
+
+from ..json_provider import dumps
+
+
+def _encode(data):
+  return data.encode('utf-8') if isinstance(data, str) else data
+
+
+def stream_json(query, serialize):
+  chunk_size = current_app.config['SOCCER_STREAM_CHUNK_SIZE']
+
+  def generate():
+    # rows are encoded one by one but sent in chunks of chunk_size rows
+    buffer = [b'[']
+    for i, row in enumerate(query.yield_per(chunk_size)):
+      if i:
+        buffer.append(b',')
+      buffer.append(_encode(dumps(serialize(row))))
+      if len(buffer) >= 2 * chunk_size:
+        yield b''.join(buffer)
+        buffer = []
+    buffer.append(b']\n')
+    yield b''.join(buffer)
+
+  return current_app.response_class(
+      stream_with_context(generate()), mimetype=current_app.config['JSONIFY_MIMETYPE'])
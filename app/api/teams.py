@@ -1,23 +1,34 @@
-from flask import jsonify, request, url_for
+from flask import current_app, request, url_for
 from flask_jwt import current_identity, jwt_required
 
 from .. import db
+from ..json_provider import jsonify
 from ..models import Team, User
 from . import api
-from .decorators import admin_required, validate_input
+from .decorators import (admin_required, cached_response, jwt_claims_required,
+                         validate_input, versioned)
 from .errors import conflict, forbidden
+from .pagination import paginate
+from .streaming import stream_json
 
 
 @api.route('/teams')
-@jwt_required()
+@jwt_claims_required()
 def get_teams():
-  teams = Team.query.all()
-  teams = list(map(lambda t: t.to_json(), teams))
-  return jsonify(teams)
+  if current_app.config['SOCCER_STREAM_RESPONSES']:
+    teams, headers = paginate(db.session.query(
+        Team, Team.value_column()), Team, 'api.get_teams', stream=True)
+    return stream_json(teams, lambda row: row[0].to_json(value=int(row[1]))), 200, headers
+
+  teams, headers = paginate(Team.query, Team, 'api.get_teams')
+  values = Team.get_values([t.id for t in teams])
+  teams = list(map(lambda t: t.to_json(value=values[t.id]), teams))
+  return jsonify(teams), 200, headers
 
 
 @api.route('/teams/<int:id>')
-@jwt_required()
+@jwt_claims_required()
+@cached_response()
 def get_team(id):
   team = Team.query.get_or_404(id)
   return jsonify(team.to_json())
@@ -84,12 +95,12 @@ def new_team():
 })
 def edit_team(id):
   team = Team.query.get_or_404(id)
-  if team.user_id != current_identity.id and not current_identity.role.administrator:
+  if team.user_id != current_identity.id and not current_identity.administrator:
     return forbidden('cannot edit this team')
 
   json_team = request.json
   if 'user_id' in json_team:
-    if not current_identity.role.administrator:
+    if not current_identity.administrator:
       return forbidden('cannot change team\'s owner')
 
     user = User.query.get(json_team['user_id'])
@@ -100,7 +111,7 @@ def edit_team(id):
     team.user_id = json_team['user_id']
 
   if 'wallet' in json_team:
-    if not current_identity.role.administrator:
+    if not current_identity.administrator:
       return forbidden('cannot update team\'s wallet')
     team.wallet = json_team['wallet']
 
@@ -127,7 +138,9 @@ def delete_team(id):
 
 
 @api.route('/teams/<int:id>/players')
-@jwt_required()
+@jwt_claims_required()
+@versioned('team:{id}')
+@cached_response()
 def get_team_players(id):
   team = Team.query.get_or_404(id)
   players = list(map(lambda p: p.to_json(), team.players))
@@ -1,25 +1,34 @@
-from flask import jsonify, request, url_for
+from flask import current_app, request, url_for
 from flask_jwt import current_identity, jwt_required
 
 from .. import db
-from ..models import Player, Role, Team, User
-from ..utils import (get_random_age, get_random_country, get_random_firstname,
-                     get_random_lastname)
+from ..json_provider import jsonify
+from ..models import Player, PlayerSearchToken, Role, Team, User
+from ..utils import (ALIGNMENT, get_random_age, get_random_country,
+                     get_random_firstname, get_random_lastname)
 from . import api
-from .decorators import admin_required, validate_input
+from .decorators import admin_required, jwt_claims_required, validate_input
 from .errors import conflict, forbidden, page_not_found
+from .pagination import paginate
+from .streaming import stream_json
 
 
 @api.route('/users')
-@jwt_required()
+@jwt_claims_required()
 def get_users():
-  users = User.query.all()
-  users = list(map(lambda u: u.to_json(), users))
-  return jsonify(users)
+  if current_app.config['SOCCER_STREAM_RESPONSES']:
+    users, headers = paginate(db.session.query(
+        User, User.has_team_column()), User, 'api.get_users', stream=True)
+    return stream_json(users, lambda row: row[0].to_json(has_team=row[1])), 200, headers
+
+  users, headers = paginate(User.query, User, 'api.get_users')
+  owners = User.get_team_owners([u.id for u in users])
+  users = list(map(lambda u: u.to_json(has_team=u.id in owners), users))
+  return jsonify(users), 200, headers
 
 
 @api.route('/users/<int:id>')
-@jwt_required()
+@jwt_claims_required()
 def get_user(id):
   user = User.query.get_or_404(id)
   return jsonify(user.to_json())
@@ -53,13 +62,13 @@ def new_user():
   if user:
     return conflict('email already registered')
   if 'role_id' not in json_user:
-    role = Role.query.filter_by(default=True).first()
+    role = Role.registry().default()
   else:
-    role = Role.query.get(json_user['role_id'])
+    role = Role.registry().get(json_user['role_id'])
     if role == None:
       return conflict('role doesn\'t exist')
   user = User(email=json_user['username'],
-              password=json_user['password'], role=role)
+              password=json_user['password'], role_id=role.id)
   db.session.add(user)
   db.session.commit()
   return jsonify(user.to_json()), 201,  {'Location': url_for('api.get_user', id=user.id, _external=True)}
@@ -86,11 +95,11 @@ def new_user():
     }
 )
 def edit_user(id):
-  if id != current_identity.id and not current_identity.role.administrator:
+  if id != current_identity.id and not current_identity.administrator:
     return forbidden('cannot edit other user')
   json_user = request.json
 
-  if 'role_id' in json_user and not current_identity.role.administrator:
+  if 'role_id' in json_user and not current_identity.administrator:
     return forbidden('cannot edit your role')
 
   user = User.query.get_or_404(id)
@@ -105,10 +114,10 @@ def edit_user(id):
     user.password = json_user['password']
 
   if 'role_id' in json_user:
-    role = Role.query.get(json_user['role_id'])
+    role = Role.registry().get(json_user['role_id'])
     if role == None:
       return conflict('role doesn\'t exist')
-    user.role = role
+    user.role_id = role.id
 
   db.session.add(user)
   db.session.commit()
@@ -148,34 +157,32 @@ def register_user():
   user = User.query.filter_by(email=json_user['username']).first()
   if user:
     return conflict('email already registered')
-  role_user = Role.query.filter_by(name='User').first()
+  role_user = Role.registry().get_by_name('User')
   user = User(email=json_user['username'],
               password=json_user['password'], role_id=role_user.id)
 
   # create user's team
   team = Team(name='New team', country=get_random_country(), wallet=5000000)
   team.user = user
+  db.session.add(user)
+  db.session.add(team)
+  db.session.flush()
 
   # create team's players
-  alignment = [
-      (3, 'Goalkeeper'),
-      (6, 'Defender'),
-      (6, 'Midfielder'),
-      (5, 'Attacker')
-  ]
-  for qty, pos in alignment:
+  players = []
+  for qty, pos in ALIGNMENT:
     for _ in range(qty):
-      player = Player(name=get_random_firstname(), lastname=get_random_lastname(
-      ), country=get_random_country(), value=1000000, age=get_random_age(), position=pos)
-      team.players.append(player)
-  db.session.add(user)
-  db.session.add(team)
+      players.append({'name': get_random_firstname(), 'lastname': get_random_lastname(),
+                      'country': get_random_country(), 'value': 1000000, 'age': get_random_age(),
+                      'position': pos, 'team_id': team.id})
+  Player.bulk_insert(players)
+  PlayerSearchToken.index_team(team.id)
   db.session.commit()
   return jsonify(user.to_json()), 201,  {'Location': url_for('api.get_user', id=user.id, _external=True)}
 
 
 @api.route('/users/<int:id>/team')
-@jwt_required()
+@jwt_claims_required()
 def get_user_team(id):
   user = User.query.get_or_404(id)
   if user.team:
@@ -185,7 +192,7 @@ def get_user_team(id):
 
 
 @api.route('/users/<int:id>/team/players')
-@jwt_required()
+@jwt_claims_required()
 def get_user_team_players(id):
   user = User.query.get_or_404(id)
   if user.team:
@@ -1,12 +1,165 @@
+import hashlib
+import hmac
+import time
+
+from flask import current_app
+from flask_jwt import _default_jwt_payload_handler
+
+from .caching import CacheError, MemoryCache, bump_generation, create_cache, get_generation
+
+
+class Identity(object):
+  def __init__(self, id, administrator, team_id):
+    self.id = id
+    self.administrator = administrator
+    self.team_id = team_id
+
+
+class RevocationList(object):
+  # users whose token claims are stale, kept as long as their tokens can be valid.
+  # revocations are never dropped: when one cannot be stored, every token issued
+  # before it falls back to the database check
+  def __init__(self, cache, ttl):
+    self.cache = cache
+    self.ttl = ttl
+    self.overflow = None
+
+  def revoke(self, user_id):
+    now = time.time()
+    try:
+      self.cache.set('revoked:%d' % user_id, now)
+    except CacheError as e:
+      self.overflow = now
+      current_app.logger.error('cannot revoke claims of user %d: %s', user_id, e)
+
+  def revoked_at(self, user_id):
+    try:
+      revoked_at = self.cache.get('revoked:%d' % user_id)
+    except CacheError as e:
+      current_app.logger.error('cannot read revoked claims: %s', e)
+      return time.time()
+    overflow = self.overflow
+    if overflow is not None and overflow + self.ttl > time.time():
+      revoked_at = max(revoked_at or 0, overflow)
+    return revoked_at
+
+
+def init_identity_cache(app):
+  from . import db
+
+  app.extensions['identity_cache'] = MemoryCache(
+      app.config['SOCCER_IDENTITY_CACHE_SIZE'], app.config['SOCCER_IDENTITY_CACHE_TTL'])
+  app.extensions['credential_cache'] = MemoryCache(
+      app.config['SOCCER_CREDENTIAL_CACHE_SIZE'], app.config['SOCCER_CREDENTIAL_CACHE_TTL'])
+  ttl = int(app.config['JWT_EXPIRATION_DELTA'].total_seconds())
+  revocations = create_cache(
+      app.config['SOCCER_REVOCATION_LIST'], app.config['SOCCER_REVOCATION_LIST_SIZE'],
+      ttl, app.config['SOCCER_REVOCATION_LIST_URL'], evict=False)
+  app.extensions['revoked_claims'] = revocations and RevocationList(revocations, ttl)
+
+  # users are collected on flush and invalidated once the transaction is committed
+  if not db.event.contains(db.session, 'after_flush', _collect_users):
+    db.event.listen(db.session, 'after_flush', _collect_users)
+    db.event.listen(db.session, 'after_commit', _invalidate_users)
+    db.event.listen(db.session, 'after_rollback', _discard_users)
+
+
+def _collect_users(session, flush_context):
+  from . import db
+  from .models import Team, User
+  user_ids = session.info.setdefault('invalidate_users', set())
+  # only role and team changes make token claims stale
+  revoked_ids = session.info.setdefault('revoke_claims', set())
+  for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+    state = db.inspect(obj)
+    if isinstance(obj, User) and obj not in session.new:
+      user_ids.add(obj.id)
+      if obj in session.deleted or state.attrs.role_id.history.has_changes():
+        revoked_ids.add(obj.id)
+    elif isinstance(obj, Team):
+      history = state.attrs.user_id.history
+      if obj in session.new or obj in session.deleted or history.has_changes():
+        changed_ids = set([obj.user_id] + list(history.deleted or [])) - set([None])
+        user_ids.update(changed_ids)
+        revoked_ids.update(changed_ids)
+
+
+def _invalidate_users(session):
+  user_ids = session.info.pop('invalidate_users', None)
+  revoked_ids = session.info.pop('revoke_claims', None)
+  if user_ids:
+    bump_generation(current_app.extensions['identity_cache'], *user_ids)
+    credentials = current_app.extensions['credential_cache']
+    for user_id in user_ids:
+      credentials.delete(credentials.get(user_id), user_id)
+  revocations = current_app.extensions['revoked_claims']
+  if revoked_ids and revocations is not None:
+    for user_id in revoked_ids:
+      revocations.revoke(user_id)
+
+
+def _discard_users(session):
+  session.info.pop('invalidate_users', None)
+  session.info.pop('revoke_claims', None)
+
+
+def _credential_key(email, password, password_hash):
+  # the stored hash is part of the key, so a password change in any process
+  # makes previously verified credentials unreachable
+  message = '\0'.join((email, password, password_hash)).encode('utf-8')
+  return hmac.new(current_app.config['SECRET_KEY'].encode('utf-8'),
+                  message, hashlib.sha256).hexdigest()
+
 
 def authenticate(username, password):
   from .models import User
   user = User.query.filter_by(email=username).first()
-  if user and user.verify_password(password):
+  if not user:
+    return None
+  credentials = current_app.extensions['credential_cache']
+  key = _credential_key(user.email, password, user.password_hash)
+  if credentials.get(key) == user.id:
+    return user
+  if user.verify_password(password):
+    credentials.set(key, user.id)
+    credentials.set(user.id, key)
     return user
 
 
 def identity(payload):
-  from .models import User
+  from . import db
+  from .models import Role, Team, User
+  cache = current_app.extensions['identity_cache']
   user_id = payload['identity']
-  return User.query.get(user_id)
+  # identities are stored with the generation read before loading the row, so
+  # one loaded before a concurrent invalidation is never served from the cache
+  generation = get_generation(cache, user_id)
+  entry = cache.get(user_id)
+  if entry is not None and entry[0] == generation:
+    return entry[1]
+  row = db.session.query(User.id, User.role_id, Team.id).outerjoin(
+      Team, Team.user_id == User.id).filter(User.id == user_id).first()
+  if row is None:
+    return None
+  user_identity = Identity(row[0], Role.registry().get(row[1]).administrator, row[2])
+  if generation is not None:
+    cache.set(user_id, (generation, user_identity))
+  return user_identity
+
+
+def jwt_payload(user):
+  payload = _default_jwt_payload_handler(user)
+  user_identity = identity(payload)
+  payload['administrator'] = user_identity.administrator
+  payload['team_id'] = user_identity.team_id
+  return payload
+
+
+def identity_from_claims(payload):
+  revocations = current_app.extensions['revoked_claims']
+  if revocations is None or 'administrator' not in payload:
+    return None
+  revoked_at = revocations.revoked_at(payload['identity'])
+  if revoked_at is not None and payload['iat'] <= revoked_at:
+    return None
+  return Identity(payload['identity'], payload['administrator'], payload['team_id'])
@@ -0,0 +1,100 @@
+import json
+import time
+
+from . import db
+from .models import Player, Team
+
+
+def _percentile(latencies, pct):
+  return latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]
+
+
+def _measure(requests, send):
+  latencies = []
+  errors = 0
+  start = time.perf_counter()
+  for i in range(requests):
+    request_start = time.perf_counter()
+    response = send(i)
+    response.get_data()
+    latencies.append(time.perf_counter() - request_start)
+    if response.status_code >= 400:
+      errors += 1
+  elapsed = time.perf_counter() - start
+
+  latencies.sort()
+  return {
+      'requests': requests,
+      'errors': errors,
+      'mean_ms': sum(latencies) / len(latencies) * 1000,
+      'p50_ms': _percentile(latencies, 50) * 1000,
+      'p95_ms': _percentile(latencies, 95) * 1000,
+      'p99_ms': _percentile(latencies, 99) * 1000,
+      'rps': requests / elapsed
+  }
+
+
+def _headers(token=None):
+  headers = {'Accept': 'application/json',
+             'Content-Type': 'application/json'}
+  if token:
+    headers['Authorization'] = 'JWT ' + token
+  return headers
+
+
+def run_benchmarks(app, requests=100):
+  client = app.test_client()
+  auth_url = app.config['JWT_AUTH_URL_RULE']
+  stamp = int(time.time())
+  credentials = {'username': 'bench_%d@example.com' % stamp,
+                 'password': 'bench1234'}
+
+  response = client.post('/api/users/register',
+                         data=json.dumps(credentials), headers=_headers())
+  if response.status_code != 201:
+    raise RuntimeError('cannot register benchmark user')
+  user_id = json.loads(response.get_data())['id']
+  token = json.loads(client.post(auth_url, data=json.dumps(
+      credentials), headers=_headers()).get_data())['access_token']
+
+  # sample market data and give the benchmark team enough money to buy
+  with app.app_context():
+    team = Team.query.filter_by(user_id=user_id).first()
+    team.wallet = 2**31 - 1
+    db.session.commit()
+    market = Player.query.filter_by(offer=True).filter(Player.team_id != team.id)
+    sample = market.join(Team).add_columns(Team.name).first()
+    buy_ids = [p.id for p in market.limit(requests)]
+    if sample:
+      player, team_name = sample
+      market_filters = {
+          'team': {'team': team_name},
+          'country': {'country': player.country},
+          'name': {'name': player.lastname[:4]},
+          'price': {'minPrice': player.price, 'maxPrice': player.price * 2}
+      }
+    else:
+      market_filters = {}
+
+  def get(url, query_string=None):
+    return lambda i: client.get(url, query_string=query_string, headers=_headers(token))
+
+  scenarios = [('GET /api/players', get('/api/players')),
+               ('GET /api/players/market', get('/api/players/market'))]
+  for name, query_string in market_filters.items():
+    scenarios.append(('GET /api/players/market?%s' % name,
+                      get('/api/players/market', query_string)))
+  if len(buy_ids) == requests:
+    scenarios.append(('POST /api/players/<id>/buy', lambda i: client.post(
+        '/api/players/%d/buy' % buy_ids[i], headers=_headers(token))))
+  scenarios.append(('POST /api/users/register', lambda i: client.post(
+      '/api/users/register', headers=_headers(), data=json.dumps(
+          {'username': 'bench_%d_%d@example.com' % (stamp, i), 'password': 'bench1234'}))))
+  scenarios.append(('POST %s' % auth_url, lambda i: client.post(
+      auth_url, data=json.dumps(credentials), headers=_headers())))
+
+  results = {}
+  for name, send in scenarios:
+    results[name] = _measure(requests, send)
+  return results
+
@@ -0,0 +1,182 @@
+import pickle
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+try:
+  import redis
+except ImportError:
+  redis = None
+
+
+class CacheError(Exception):
+  pass
+
+
+class MemoryCache(object):
+  def __init__(self, size, ttl, evict=True):
+    self.size = size
+    self.ttl = ttl
+    # without eviction a full cache refuses new keys instead of dropping old ones
+    self.evict = evict
+    self.entries = OrderedDict()
+    self.lock = Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      expires, value = entry
+      if expires < time.monotonic():
+        del self.entries[key]
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value):
+    if self.evict and (self.size <= 0 or self.ttl <= 0):
+      return
+    with self.lock:
+      self._set(key, value)
+
+  def add(self, key, value):
+    if self.evict and (self.size <= 0 or self.ttl <= 0):
+      return
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None or entry[0] < time.monotonic():
+        self._set(key, value)
+
+  def _set(self, key, value):
+    if not self.evict and key not in self.entries and len(self.entries) >= self.size:
+      self._purge_expired()
+      if len(self.entries) >= self.size:
+        raise CacheError('cache is full')
+    self.entries[key] = (time.monotonic() + self.ttl, value)
+    self.entries.move_to_end(key)
+    while len(self.entries) > self.size:
+      self.entries.popitem(last=False)
+
+  def delete(self, *keys):
+    with self.lock:
+      for key in keys:
+        self.entries.pop(key, None)
+
+  def _purge_expired(self):
+    now = time.monotonic()
+    for key in [k for k, (expires, _) in self.entries.items() if expires < now]:
+      del self.entries[key]
+
+
+class RedisCache(object):
+  def __init__(self, url, ttl, prefix='soccer:'):
+    if redis is None:
+      raise RuntimeError('redis cache requires the redis package')
+    self.client = redis.Redis.from_url(url)
+    self.ttl = ttl
+    self.prefix = prefix
+
+  def get(self, key):
+    try:
+      value = self.client.get(self.prefix + key)
+    except redis.RedisError as e:
+      raise CacheError(e)
+    return None if value is None else pickle.loads(value)
+
+  def set(self, key, value):
+    try:
+      self.client.setex(self.prefix + key, self.ttl, pickle.dumps(value))
+    except redis.RedisError as e:
+      raise CacheError(e)
+
+  def add(self, key, value):
+    try:
+      self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl, nx=True)
+    except redis.RedisError as e:
+      raise CacheError(e)
+
+  def delete(self, *keys):
+    if not keys:
+      return
+    try:
+      self.client.delete(*[self.prefix + key for key in keys])
+    except redis.RedisError as e:
+      raise CacheError(e)
+
+
+def create_cache(backend, size, ttl, url=None, evict=True):
+  if backend == 'memory':
+    return MemoryCache(size, ttl, evict)
+  if backend == 'redis':
+    return RedisCache(url, ttl)
+  return None
+
+
+def response_cache_key(endpoint, id=''):
+  return '%s:%s' % (endpoint, id)
+
+
+def get_generation(cache, key):
+  # entries are stored with the generation read before building them, so an
+  # entry built from rows older than an eviction never matches again
+  generation_key = 'generation:%s' % key
+  generation = cache.get(generation_key)
+  if generation is None:
+    cache.add(generation_key, uuid.uuid4().hex)
+    generation = cache.get(generation_key)
+  return generation
+
+
+def bump_generation(cache, *keys):
+  for key in keys:
+    cache.set('generation:%s' % key, uuid.uuid4().hex)
+  cache.delete(*keys)
+
+
+def _collect_evictions(session, flush_context):
+  from . import db
+  from .models import Player, Team
+  keys = session.info.setdefault('evict_responses', set())
+  for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+    if isinstance(obj, Player):
+      keys.add(response_cache_key('api.get_player', obj.id))
+      history = db.inspect(obj).attrs.team_id.history
+      for team_id in [obj.team_id] + list(history.deleted or []):
+        if team_id is not None:
+          keys.add(response_cache_key('api.get_team', team_id))
+          keys.add(response_cache_key('api.get_team_players', team_id))
+    elif isinstance(obj, Team):
+      keys.add(response_cache_key('api.get_team', obj.id))
+      keys.add(response_cache_key('api.get_team_players', obj.id))
+
+
+def _evict_responses(session):
+  from flask import current_app
+  keys = session.info.pop('evict_responses', None)
+  cache = current_app.extensions.get('response_cache')
+  if keys and cache is not None:
+    # the transaction is already committed, entries expire on their own
+    try:
+      bump_generation(cache, *keys)
+    except CacheError as e:
+      current_app.logger.error('response cache eviction failed: %s', e)
+
+
+def _discard_evictions(session):
+  session.info.pop('evict_responses', None)
+
+
+def init_response_cache(app):
+  from . import db
+
+  app.extensions['response_cache'] = create_cache(
+      app.config['SOCCER_RESPONSE_CACHE'], app.config['SOCCER_RESPONSE_CACHE_SIZE'],
+      app.config['SOCCER_RESPONSE_CACHE_TTL'], app.config['SOCCER_RESPONSE_CACHE_URL'])
+
+  # keys are collected on flush and evicted once the transaction is committed
+  if not db.event.contains(db.session, 'after_flush', _collect_evictions):
+    db.event.listen(db.session, 'after_flush', _collect_evictions)
+    db.event.listen(db.session, 'after_commit', _evict_responses)
+    db.event.listen(db.session, 'after_rollback', _discard_evictions)
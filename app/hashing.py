@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+
+from flask import current_app, has_app_context
+from werkzeug import security
+from werkzeug.exceptions import ServiceUnavailable
+
+from .metrics import PASSWORD_HASH_LATENCY, PASSWORD_HASH_REJECTED
+
+
+class PasswordHasher(object):
+  def __init__(self, workers, queue_size, admission_timeout, retry_after):
+    self.executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hasher')
+    # hashing jobs admitted at once: running on the pool plus waiting for a worker
+    self.slots = BoundedSemaphore(workers + queue_size)
+    self.admission_timeout = admission_timeout
+    self.retry_after = retry_after
+
+  def run(self, operation, f, *args):
+    if not self.slots.acquire(timeout=self.admission_timeout):
+      PASSWORD_HASH_REJECTED.labels(operation).inc()
+      raise ServiceUnavailable('too many authentication requests, try again later',
+                               retry_after=self.retry_after)
+    try:
+      return self.executor.submit(_timed, operation, f, *args).result()
+    finally:
+      self.slots.release()
+
+
+def _timed(operation, f, *args):
+  start = time.perf_counter()
+  try:
+    return f(*args)
+  finally:
+    PASSWORD_HASH_LATENCY.labels(operation).observe(time.perf_counter() - start)
+
+
+def init_password_hasher(app):
+  app.extensions['password_hasher'] = PasswordHasher(
+      app.config['SOCCER_HASH_WORKERS'], app.config['SOCCER_HASH_QUEUE_SIZE'],
+      app.config['SOCCER_HASH_ADMISSION_TIMEOUT'], app.config['SOCCER_HASH_RETRY_AFTER'])
+
+
+def _run(operation, f, *args):
+  # outside an application (e.g. scripts) hashing just runs on the caller thread
+  if not has_app_context() or 'password_hasher' not in current_app.extensions:
+    return _timed(operation, f, *args)
+  return current_app.extensions['password_hasher'].run(operation, f, *args)
+
+
+def generate_password_hash(password):
+  method = 'pbkdf2:sha256'
+  salt_length = 8
+  if has_app_context():
+    method = current_app.config['SOCCER_HASH_METHOD']
+    salt_length = current_app.config['SOCCER_HASH_SALT_LENGTH']
+  return _run('generate', security.generate_password_hash, password, method, salt_length)
+
+
+def check_password_hash(password_hash, password):
+  return _run('check', security.check_password_hash, password_hash, password)
@@ -0,0 +1,41 @@
+import re
+import time
+from collections import Counter
+
+from flask import g, request
+from flask_sqlalchemy import get_debug_queries
+
+
+def fingerprint(statement):
+  statement = re.sub(r"'(?:[^']|'')*'", '?', statement)
+  statement = re.sub(r'%s|%\(\w+\)s|:\w+|\b\d+\b', '?', statement)
+  statement = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?+)', statement)
+  return ' '.join(statement.split())
+
+
+def init_query_stats(app):
+  # request start and query offset are also read by metrics
+  @app.before_request
+  def start_query_stats():
+    g.request_start = time.perf_counter()
+    # recorded queries live in the app context, which may outlive the request
+    g.query_offset = len(get_debug_queries())
+
+  @app.after_request
+  def add_query_stats(response):
+    if not app.config['SOCCER_QUERY_STATS'] or 'query_offset' not in g:
+      return response
+    queries = get_debug_queries()[g.query_offset:]
+    db_time = sum(q.duration for q in queries) * 1000
+    duration = (time.perf_counter() - g.request_start) * 1000
+    response.headers['X-Query-Count'] = str(len(queries))
+    response.headers['X-DB-Time-ms'] = '%.2f' % db_time
+
+    if len(queries) > app.config['SOCCER_QUERY_COUNT_LIMIT'] or \
+            duration > app.config['SOCCER_SLOW_REQUEST_MS']:
+      statements = Counter(fingerprint(q.statement) for q in queries)
+      app.logger.warning('%s %s: %d queries, %.2fms db, %.2fms total\n%s', request.method,
+                         request.path, len(queries), db_time, duration,
+                         '\n'.join('  %dx %s' % (count, statement)
+                                   for statement, count in statements.most_common()))
+    return response
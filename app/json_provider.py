@@ -0,0 +1,46 @@
+from flask import current_app
+from flask import json as flask_json
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+
+def _json_dumps(obj, pretty=False, newline=True):
+  if pretty:
+    rv = flask_json.dumps(obj, indent=2, separators=(', ', ': '))
+  else:
+    rv = flask_json.dumps(obj, separators=(',', ':'))
+  return rv + '\n' if newline else rv
+
+
+def _orjson_dumps(obj, pretty=False, newline=True):
+  # dates and dataclasses are left to flask's encoder to keep the same output
+  option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | \
+      orjson.OPT_PASSTHROUGH_DATACLASS
+  if newline:
+    option |= orjson.OPT_APPEND_NEWLINE
+  if current_app.config['JSON_SORT_KEYS']:
+    option |= orjson.OPT_SORT_KEYS
+  if pretty:
+    option |= orjson.OPT_INDENT_2
+  return orjson.dumps(obj, default=current_app.json_encoder().default, option=option)
+
+
+def init_json_provider(app):
+  if app.config['SOCCER_JSON_ENCODER'] == 'orjson' and orjson is not None:
+    app.extensions['json_dumps'] = _orjson_dumps
+  else:
+    app.extensions['json_dumps'] = _json_dumps
+
+
+def dumps(obj):
+  return current_app.extensions['json_dumps'](obj, newline=False)
+
+
+def jsonify(obj):
+  pretty = current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] or current_app.debug
+  return current_app.response_class(
+      current_app.extensions['json_dumps'](obj, pretty),
+      mimetype=current_app.config['JSONIFY_MIMETYPE'])
@@ -0,0 +1,18 @@
+from flask import _app_ctx_stack, _request_ctx_stack, url_for
+
+# placeholder id, replaced with real ids in the cached URL templates
+_ID_PLACEHOLDER = 9876543210
+
+
+def link_for(endpoint, id):
+  # URL prefix doesn't change during a request, so templates live in its context
+  ctx = _request_ctx_stack.top or _app_ctx_stack.top
+  templates = getattr(ctx, 'link_templates', None)
+  if templates is None:
+    templates = ctx.link_templates = {}
+  template = templates.get(endpoint)
+  if template is None:
+    url = url_for(endpoint, id=_ID_PLACEHOLDER, _external=True)
+    prefix, _, suffix = url.rpartition(str(_ID_PLACEHOLDER))
+    template = templates[endpoint] = (prefix, suffix)
+  return template[0] + str(id) + template[1]
@@ -0,0 +1,59 @@
+import os
+import time
+
+from flask import g, request
+from flask_sqlalchemy import get_debug_queries
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry,
+                               Counter, Gauge, Histogram, generate_latest)
+from prometheus_client import multiprocess
+
+REQUESTS = Counter('soccer_http_requests_total', 'HTTP requests by endpoint and status',
+                   ['endpoint', 'method', 'status'])
+REQUEST_LATENCY = Histogram('soccer_http_request_duration_seconds', 'HTTP request latency',
+                            ['endpoint', 'method'])
+REQUEST_QUERIES = Histogram('soccer_http_request_queries', 'SQL queries run by a request',
+                            ['endpoint'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500))
+RESPONSE_CACHE = Counter('soccer_response_cache_requests_total', 'Response cache lookups',
+                         ['endpoint', 'result'])
+DB_POOL = Gauge('soccer_db_pool_connections', 'Database pool connections',
+                ['state'], multiprocess_mode='livesum')
+PASSWORD_HASH_LATENCY = Histogram('soccer_password_hash_duration_seconds',
+                                  'Password hashing time', ['operation'])
+PASSWORD_HASH_REJECTED = Counter('soccer_password_hash_rejected_total',
+                                 'Password hashing jobs rejected by admission control',
+                                 ['operation'])
+
+
+def _pool_usage(pool):
+  if not hasattr(pool, 'checkedout'):
+    return {}
+  return {'checked_out': pool.checkedout(), 'checked_in': pool.checkedin(),
+          'overflow': max(pool.overflow(), 0)}
+
+
+def init_metrics(app):
+  from . import db
+
+  @app.after_request
+  def record_metrics(response):
+    if 'request_start' not in g:
+      return response
+    endpoint = request.endpoint or 'unknown'
+    REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+    REQUEST_LATENCY.labels(endpoint, request.method).observe(
+        time.perf_counter() - g.request_start)
+    REQUEST_QUERIES.labels(endpoint).observe(
+        len(get_debug_queries()) - g.query_offset)
+    for state, value in _pool_usage(db.engine.pool).items():
+      DB_POOL.labels(state).set(value)
+    return response
+
+
+def generate_metrics():
+  # with several worker processes, metrics are aggregated from prometheus_multiproc_dir
+  if 'prometheus_multiproc_dir' in os.environ:
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+  else:
+    registry = REGISTRY
+  return generate_latest(registry), CONTENT_TYPE_LATEST
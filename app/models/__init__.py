@@ -1,4 +1,6 @@
 from .players import Player
 from .roles import Role
+from .search_tokens import PlayerSearchToken
 from .teams import Team
 from .users import User
+from .versions import Version
@@ -1,15 +1,18 @@
-from flask import url_for
-
 from .. import db
+from ..links import link_for
 
 
 class Player(db.Model):
   __tablename__ = 'players'
+  __table_args__ = (
+      db.Index('ix_players_offer_price', 'offer', 'price'),
+      db.Index('ix_players_offer_country_price', 'offer', 'country', 'price')
+  )
   id = db.Column(db.Integer, primary_key=True)
   name = db.Column(db.String(64), nullable=False)
   lastname = db.Column(db.String(64), nullable=False)
   country = db.Column(db.String(64), nullable=False)
-  team_id = db.Column(db.Integer, db.ForeignKey('teams.id'))
+  team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), index=True)
   team = db.relationship('Team', backref=db.backref(
       'players', lazy=True))
   value = db.Column(db.Integer, nullable=False)
@@ -18,10 +21,15 @@ class Player(db.Model):
   price = db.Column(db.Integer)
   position = db.Column(db.String(64), nullable=False)
 
+  @staticmethod
+  def bulk_insert(rows):
+    # one multi-row INSERT, bypassing the unit of work and its events
+    db.session.execute(Player.__table__.insert().values(rows))
+
   def to_json(self, show_price=False):
     json_player = {
         'id': self.id,
-        'url': url_for('api.get_player', id=self.id, _external=True),
+        'url': link_for('api.get_player', self.id),
         'name': self.name,
         'lastname': self.lastname,
         'country': self.country,
@@ -30,8 +38,7 @@ class Player(db.Model):
         'position': self.position
     }
     if self.team_id:
-      json_player['team'] = url_for(
-          'api.get_team', id=self.team_id, _external=True)
+      json_player['team'] = link_for('api.get_team', self.team_id)
     if show_price:
       json_player['price'] = self.price
     return json_player
@@ -1,6 +1,10 @@
-from flask import url_for
+from collections import namedtuple
+from threading import Lock
+
+from flask import current_app
 
 from .. import db
+from ..links import link_for
 
 
 class Role(db.Model):
@@ -20,10 +24,87 @@ class Role(db.Model):
     db.session.add(role_user)
     db.session.commit()
 
+  @staticmethod
+  def registry():
+    registry = current_app.extensions.get('roles')
+    if registry is None:
+      registry = current_app.extensions.setdefault('roles', RoleRegistry())
+    return registry
+
+
+class RoleEntry(namedtuple('RoleEntry', ['id', 'name', 'administrator', 'default'])):
+  __slots__ = ()
+
   def to_json(self):
     json_role = {
-        'url': url_for('api.get_role', id=self.id, _external=True),
+        'url': link_for('api.get_role', self.id),
         'name': self.name,
         'id': self.id
     }
     return json_role
+
+
+class RoleRegistry(object):
+  # roles are read once and served from memory until they are reloaded
+  def __init__(self):
+    self.lock = Lock()
+    self.state = None
+
+  def reload(self):
+    # waits for a load in progress, so roles read before a change are dropped
+    with self.lock:
+      self.state = None
+
+  def _load(self):
+    state = self.state
+    if state is None:
+      with self.lock:
+        if self.state is None:
+          # roles are read outside the caller's transaction, so neither an old
+          # snapshot nor uncommitted changes end up in the registry
+          table = Role.__table__
+          with db.engine.connect() as connection:
+            rows = connection.execute(db.select([
+                table.c.id, table.c.name, table.c.administrator,
+                table.c.default]).order_by(table.c.id)).fetchall()
+          roles = tuple(RoleEntry(id, name, bool(administrator), bool(default))
+                        for id, name, administrator, default in rows)
+          self.state = (roles, dict((r.id, r) for r in roles),
+                        dict((r.name, r) for r in roles))
+        state = self.state
+    return state
+
+  def all(self):
+    return self._load()[0]
+
+  def get(self, id):
+    return self._load()[1].get(id)
+
+  def get_by_name(self, name):
+    return self._load()[2].get(name)
+
+  def default(self):
+    return next((r for r in self.all() if r.default), None)
+
+
+def _collect_roles(session, flush_context):
+  changes = list(session.new) + list(session.dirty) + list(session.deleted)
+  if any(isinstance(obj, Role) for obj in changes):
+    session.info['reload_roles'] = True
+
+
+def _reload_registry(session):
+  if session.info.pop('reload_roles', None):
+    registry = current_app.extensions.get('roles')
+    if registry is not None:
+      registry.reload()
+
+
+def _discard_roles(session):
+  session.info.pop('reload_roles', None)
+
+
+# roles are collected on flush and reloaded once the transaction is committed
+db.event.listen(db.session, 'after_flush', _collect_roles)
+db.event.listen(db.session, 'after_commit', _reload_registry)
+db.event.listen(db.session, 'after_rollback', _discard_roles)
@@ -0,0 +1,81 @@
+import unicodedata
+
+from .. import db
+from .players import Player
+
+
+def normalize(text):
+  text = unicodedata.normalize('NFKD', text)
+  return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def trigrams(text):
+  text = normalize(text)
+  return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class PlayerSearchToken(db.Model):
+  __tablename__ = 'player_search_tokens'
+  token = db.Column(db.String(3), primary_key=True)
+  player_id = db.Column(db.Integer, db.ForeignKey(
+      'players.id', ondelete='CASCADE'), primary_key=True, index=True)
+
+  @staticmethod
+  def get_rows(player_id, name, lastname):
+    tokens = trigrams(name) | trigrams(lastname)
+    return [{'token': t, 'player_id': player_id} for t in tokens]
+
+  @staticmethod
+  def index_team(team_id):
+    players = db.session.query(
+        Player.id, Player.name, Player.lastname).filter_by(team_id=team_id)
+    rows = [row for p in players for row in PlayerSearchToken.get_rows(*p)]
+    if rows:
+      db.session.execute(PlayerSearchToken.__table__.insert().values(rows))
+
+  @staticmethod
+  def search(term):
+    # terms with wildcards or shorter than a trigram can't use the index
+    tokens = trigrams(term)
+    if not tokens or '%' in term or '_' in term:
+      return None
+    return db.session.query(PlayerSearchToken.player_id).filter(
+        PlayerSearchToken.token.in_(tokens)).group_by(
+        PlayerSearchToken.player_id).having(db.func.count() == len(tokens))
+
+  @staticmethod
+  def rebuild(batch_size=10000):
+    table = PlayerSearchToken.__table__
+    db.session.execute(table.delete())
+    last_id = 0
+    while True:
+      players = db.session.query(Player.id, Player.name, Player.lastname).filter(
+          Player.id > last_id).order_by(Player.id).limit(batch_size).all()
+      if not players:
+        break
+      rows = [row for p in players for row in PlayerSearchToken.get_rows(*p)]
+      if rows:
+        db.session.execute(table.insert(), rows)
+      last_id = players[-1].id
+    db.session.commit()
+
+
+@db.event.listens_for(Player, 'after_insert')
+def _index_player(mapper, connection, player):
+  rows = PlayerSearchToken.get_rows(player.id, player.name, player.lastname)
+  if rows:
+    connection.execute(PlayerSearchToken.__table__.insert(), rows)
+
+
+@db.event.listens_for(Player, 'after_update')
+def _reindex_player(mapper, connection, player):
+  state = db.inspect(player)
+  if state.attrs.name.history.has_changes() or state.attrs.lastname.history.has_changes():
+    _unindex_player(mapper, connection, player)
+    _index_player(mapper, connection, player)
+
+
+@db.event.listens_for(Player, 'before_delete')
+def _unindex_player(mapper, connection, player):
+  table = PlayerSearchToken.__table__
+  connection.execute(table.delete().where(table.c.player_id == player.id))
@@ -1,35 +1,47 @@
-from flask import url_for
-
 from .. import db
+from ..links import link_for
+from .players import Player
 
 
 class Team(db.Model):
   __tablename__ = 'teams'
   id = db.Column(db.Integer, primary_key=True)
-  name = db.Column(db.String(64), nullable=False)
+  name = db.Column(db.String(64), nullable=False, index=True)
   country = db.Column(db.String(64), nullable=False)
   user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True)
   user = db.relationship('User', backref=db.backref(
       'team', lazy=True, uselist=False))
   wallet = db.Column(db.Integer, nullable=False)
 
-  def to_json(self):
+  @staticmethod
+  def value_column():
+    return db.select([db.func.coalesce(db.func.sum(Player.value), 0)]).where(
+        Player.team_id == Team.id).label('value')
+
+  @staticmethod
+  def get_values(team_ids):
+    values = dict.fromkeys(team_ids, 0)
+    if team_ids:
+      rows = db.session.query(Player.team_id, db.func.sum(Player.value)).filter(
+          Player.team_id.in_(team_ids)).group_by(Player.team_id)
+      for team_id, value in rows:
+        values[team_id] = int(value)
+    return values
+
+  def to_json(self, value=None):
     json_team = {
         'id': self.id,
-        'url': url_for('api.get_team', id=self.id, _external=True),
+        'url': link_for('api.get_team', self.id),
         'name': self.name,
         'country': self.country,
         'wallet': self.wallet,
-        'players': url_for('api.get_team_players', id=self.id, _external=True)
+        'players': link_for('api.get_team_players', self.id)
     }
     if self.user_id:
-      json_team['user'] = url_for(
-          'api.get_user', id=self.user_id, _external=True)
+      json_team['user'] = link_for('api.get_user', self.user_id)
 
-    value = 0
-    if self.players:
-      for p in self.players:
-        value += p.value
+    if value is None:
+      value = Team.get_values([self.id])[self.id]
 
     json_team['value'] = value
 
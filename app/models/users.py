@@ -1,8 +1,8 @@
-from flask import url_for
-from werkzeug.security import check_password_hash, generate_password_hash
-
 from .. import db
+from ..hashing import check_password_hash, generate_password_hash
+from ..links import link_for
 from .roles import Role
+from .teams import Team
 
 
 class User(db.Model):
@@ -23,24 +23,35 @@ class User(db.Model):
   def verify_password(self, password):
     return check_password_hash(self.password_hash, password)
 
-  def to_json(self):
+  @staticmethod
+  def has_team_column():
+    return db.exists().where(Team.user_id == User.id).label('has_team')
+
+  @staticmethod
+  def get_team_owners(user_ids):
+    if not user_ids:
+      return set()
+    rows = db.session.query(Team.user_id).filter(Team.user_id.in_(user_ids))
+    return set(user_id for user_id, in rows)
+
+  def to_json(self, has_team=None):
     json_user = {
-        'url': url_for('api.get_user', id=self.id, _external=True),
+        'url': link_for('api.get_user', self.id),
         'email': self.email,
         'id': self.id,
-        'role': url_for('api.get_role', id=self.role_id, _external=True)
+        'role': link_for('api.get_role', self.role_id)
     }
-    if self.team:
-      json_user['team'] = url_for(
-          'api.get_user_team', id=self.id, _external=True)
-      json_user['players'] = url_for(
-          'api.get_user_team_players', id=self.id, _external=True)
+    if has_team is None:
+      has_team = self.team is not None
+    if has_team:
+      json_user['team'] = link_for('api.get_user_team', self.id)
+      json_user['players'] = link_for('api.get_user_team_players', self.id)
     return json_user
 
   @staticmethod
   def create_admin_user():
     user_admin = User(email='admin@admin.com', password='admin1234')
-    role_admin = Role.query.filter_by(name='Administrator').first()
+    role_admin = Role.registry().get_by_name('Administrator')
 
     user_admin.role_id = role_admin.id
 
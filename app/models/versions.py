@@ -0,0 +1,67 @@
+from sqlalchemy.exc import IntegrityError
+
+from .. import db
+
+
+class Version(db.Model):
+  __tablename__ = 'versions'
+  name = db.Column(db.String(64), primary_key=True)
+  version = db.Column(db.Integer, nullable=False, default=0)
+
+  @staticmethod
+  def get(name):
+    row = db.session.query(Version.version).filter_by(name=name).first()
+    return row.version if row else 0
+
+  @staticmethod
+  def bump(names, session=None):
+    # counters are bumped in the caller's transaction, in name order, so they are
+    # committed together with the change they tag
+    session = session or db.session
+    table = Version.__table__
+    for name in sorted(names):
+      update = table.update().where(table.c.name == name).values(
+          version=table.c.version + 1)
+      if session.execute(update).rowcount:
+        continue
+      try:
+        session.execute(table.insert().values(name=name, version=1))
+      except IntegrityError:
+        session.execute(update)
+
+
+def _collect_versions(session, flush_context):
+  from .players import Player
+  from .teams import Team
+  names = session.info.setdefault('bump_versions', set())
+  for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+    state = db.inspect(obj)
+    if isinstance(obj, Player):
+      # market only lists offered players
+      if obj.offer or state.attrs.offer.history.has_changes():
+        names.add('players')
+      for team_id in [obj.team_id] + list(state.attrs.team_id.history.deleted or []):
+        if team_id is not None:
+          names.add('team:%d' % team_id)
+    elif isinstance(obj, Team):
+      # market can be filtered by team name
+      if state.attrs.name.history.deleted:
+        names.add('players')
+      names.add('team:%d' % obj.id)
+
+
+def _bump_versions(session):
+  # pending changes are flushed first, so counters are locked only until the commit
+  session.flush()
+  names = session.info.pop('bump_versions', None)
+  if names:
+    Version.bump(names, session)
+
+
+def _discard_versions(session):
+  session.info.pop('bump_versions', None)
+
+
+db.event.listen(db.session, 'after_flush', _collect_versions)
+db.event.listen(db.session, 'before_commit', _bump_versions)
+db.event.listen(db.session, 'after_rollback', _discard_versions)
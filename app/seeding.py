@@ -0,0 +1,64 @@
+from . import db
+from .hashing import generate_password_hash
+from .models import Player, PlayerSearchToken, Role, Team, User, Version
+from .utils import generate_rosters, np
+
+
+def _next_id(model):
+  return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def seed_database(users, offer_ratio=0.1, seed=None, batch_size=1000, password='pass1234'):
+  if np is None:
+    raise RuntimeError('seeding requires numpy')
+  rng = np.random.default_rng(seed)
+  role_user = Role.registry().get_by_name('User')
+  if role_user is None:
+    raise RuntimeError('roles are not initialized')
+
+  # hashing is slow, every seeded user shares the same password
+  password_hash = generate_password_hash(password)
+  user_id, team_id, player_id = _next_id(User), _next_id(Team), _next_id(Player)
+  rows = 0
+
+  with db.session.no_autoflush:
+    for start in range(0, users, batch_size):
+      size = min(batch_size, users - start)
+      teams, players = generate_rosters(size, seed=rng)
+
+      user_rows = [{'id': user_id + i, 'email': 'seed_user_%d@example.com' % (user_id + i),
+                    'role_id': role_user.id, 'password_hash': password_hash} for i in range(size)]
+      team_rows = [{'id': team_id + i, 'name': 'Team %d' % (team_id + i), 'country': country,
+                    'wallet': 5000000, 'user_id': user_id + i}
+                   for i, country in enumerate(teams['country'].tolist())]
+
+      n_players = len(players['name'])
+      offers = (rng.random(n_players) < offer_ratio).tolist()
+      prices = rng.integers(1000000, 2000001, n_players).tolist()
+      player_rows = []
+      token_rows = []
+      columns = zip(players['team_index'].tolist(), players['name'].tolist(), players['lastname'].tolist(),
+                    players['country'].tolist(), players['age'].tolist(), players['position'].tolist(),
+                    offers, prices)
+      for i, (team_index, name, lastname, country, age, position, offer, price) in enumerate(columns):
+        player_rows.append({'id': player_id + i, 'name': name, 'lastname': lastname, 'country': country,
+                            'team_id': team_id + team_index, 'value': 1000000, 'age': age,
+                            'offer': offer, 'price': price if offer else None, 'position': position})
+        token_rows.extend(PlayerSearchToken.get_rows(
+            player_id + i, name, lastname))
+
+      db.session.execute(User.__table__.insert(), user_rows)
+      db.session.execute(Team.__table__.insert(), team_rows)
+      db.session.execute(Player.__table__.insert(), player_rows)
+      db.session.execute(PlayerSearchToken.__table__.insert(), token_rows)
+      db.session.commit()
+
+      user_id += size
+      team_id += size
+      player_id += n_players
+      rows += len(user_rows) + len(team_rows) + len(player_rows) + len(token_rows)
+
+  # bulk inserts skip session events, market pollers must see the new players
+  Version.bump(['players'])
+  db.session.commit()
+  return rows
@@ -0,0 +1,132 @@
+import random
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from werkzeug.exceptions import NotFound
+
+from . import db
+from .models import Player, Team
+from .utils import update_player_price
+
+# MySQL lock wait timeout and deadlock, SQLite busy database
+RETRYABLE_ERRORS = (1205, 1213, 'database is locked')
+
+
+class TransferError(Exception):
+  pass
+
+
+def _is_retryable(error):
+  args = getattr(error.orig, 'args', ())
+  return bool(args) and (args[0] in RETRYABLE_ERRORS or str(args[0]) in RETRYABLE_ERRORS)
+
+
+def _lock_player(player_id):
+  player = Player.query.filter_by(id=player_id).with_for_update().populate_existing().first()
+  if player is None:
+    raise NotFound()
+  return player
+
+
+def _lock_players(player_ids):
+  # players are locked before teams and in id order, like single transfers
+  players = Player.query.filter(Player.id.in_(sorted(player_ids))).order_by(
+      Player.id).with_for_update().populate_existing()
+  return dict((p.id, p) for p in players)
+
+
+def _lock_teams(team_ids):
+  # teams are always locked in id order to avoid deadlocks between transfers
+  teams = Team.query.filter(Team.id.in_(sorted(team_ids))).order_by(
+      Team.id).with_for_update().populate_existing()
+  return dict((t.id, t) for t in teams)
+
+
+def _buy_player(player_id, user_id, team_id):
+  player = _lock_player(player_id)
+  if not player.offer:
+    raise TransferError('player is not in market')
+
+  if team_id is not None and player.team_id == team_id:
+    raise TransferError('this player is already yours')
+
+  teams = _lock_teams(set(filter(None, [player.team_id, team_id])))
+  team_dest = teams.get(team_id)
+  if not team_dest or team_dest.user_id != user_id:
+    raise TransferError('you don\'t own a team')
+
+  if player.price > team_dest.wallet:
+    raise TransferError('you don\'t have enough money to buy this player')
+
+  _transfer(player, teams.get(player.team_id), team_dest)
+
+
+def _transfer(player, team_orig, team_dest):
+  if team_orig:
+    team_orig.wallet += player.price
+  team_dest.wallet -= player.price
+  player.team_id = team_dest.id
+  player.value = update_player_price(player.value)
+  player.offer = False
+
+
+def _buy_players(player_ids, user_id, team_id):
+  if team_id is None:
+    raise TransferError('you don\'t own a team')
+
+  players = _lock_players(player_ids)
+  errors = {}
+  for player_id in player_ids:
+    player = players.get(player_id)
+    if player is None:
+      errors[player_id] = 'player not found'
+    elif not player.offer:
+      errors[player_id] = 'player is not in market'
+    elif player.team_id == team_id:
+      errors[player_id] = 'this player is already yours'
+  bought = [players[i] for i in player_ids if i not in errors]
+
+  teams = _lock_teams(set([p.team_id for p in bought if p.team_id] + [team_id]))
+  team_dest = teams.get(team_id)
+  if not team_dest or team_dest.user_id != user_id:
+    raise TransferError('you don\'t own a team')
+
+  if sum(p.price for p in bought) > team_dest.wallet:
+    raise TransferError('you don\'t have enough money to buy these players')
+
+  for player in bought:
+    _transfer(player, teams.get(player.team_id), team_dest)
+  return errors
+
+
+def _run_transfer(transfer, *args):
+  retries = current_app.config['SOCCER_TRANSFER_RETRIES']
+  for attempt in range(retries + 1):
+    try:
+      result = transfer(*args)
+      db.session.commit()
+      return result
+    except OperationalError as e:
+      db.session.rollback()
+      if attempt == retries or not _is_retryable(e):
+        raise
+      # exponential backoff with jitter
+      time.sleep(current_app.config['SOCCER_TRANSFER_BACKOFF']
+                 * 2 ** attempt * random.random())
+    except Exception:
+      db.session.rollback()
+      raise
+
+
+def buy_player(player_id, user_id, team_id):
+  _run_transfer(_buy_player, player_id, user_id, team_id)
+
+
+def buy_players(player_ids, user_id, team_id):
+  # all purchasable players are bought in one transaction, the rest are reported
+  player_ids = list(OrderedDict.fromkeys(player_ids))
+  errors = _run_transfer(_buy_players, player_ids, user_id, team_id)
+  return [dict(id=i, bought=False, error=errors[i]) if i in errors
+          else dict(id=i, bought=True) for i in player_ids]
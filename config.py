@@ -9,6 +9,33 @@ class Config:
   SQLALCHEMY_TRACK_MODIFICATIONS = False
   SQLALCHEMY_RECORD_QUERIES = True
   JWT_EXPIRATION_DELTA = timedelta(minutes=600)
+  SOCCER_PAGE_SIZE = 100
+  SOCCER_MAX_PAGE_SIZE = 1000
+  SOCCER_IDENTITY_CACHE_SIZE = 10000
+  SOCCER_IDENTITY_CACHE_TTL = 60
+  SOCCER_CREDENTIAL_CACHE_SIZE = 10000
+  SOCCER_CREDENTIAL_CACHE_TTL = 300
+  SOCCER_REVOCATION_LIST = os.environ.get('SOCCER_REVOCATION_LIST') or 'memory'
+  SOCCER_REVOCATION_LIST_URL = os.environ.get('SOCCER_REVOCATION_LIST_URL')
+  SOCCER_REVOCATION_LIST_SIZE = 100000
+  SOCCER_JSON_ENCODER = os.environ.get('SOCCER_JSON_ENCODER') or 'orjson'
+  SOCCER_STREAM_RESPONSES = False
+  SOCCER_STREAM_CHUNK_SIZE = 500
+  SOCCER_QUERY_STATS = os.environ.get('SOCCER_QUERY_STATS') == '1'
+  SOCCER_QUERY_COUNT_LIMIT = 20
+  SOCCER_SLOW_REQUEST_MS = 500
+  SOCCER_RESPONSE_CACHE = os.environ.get('SOCCER_RESPONSE_CACHE') or 'memory'
+  SOCCER_RESPONSE_CACHE_URL = os.environ.get('SOCCER_RESPONSE_CACHE_URL')
+  SOCCER_RESPONSE_CACHE_SIZE = 10000
+  SOCCER_RESPONSE_CACHE_TTL = 30
+  SOCCER_TRANSFER_RETRIES = 3
+  SOCCER_TRANSFER_BACKOFF = 0.05
+  SOCCER_HASH_METHOD = os.environ.get('SOCCER_HASH_METHOD') or 'pbkdf2:sha256:150000'
+  SOCCER_HASH_SALT_LENGTH = 8
+  SOCCER_HASH_WORKERS = int(os.environ.get('SOCCER_HASH_WORKERS') or os.cpu_count() or 1)
+  SOCCER_HASH_QUEUE_SIZE = 16
+  SOCCER_HASH_ADMISSION_TIMEOUT = 0.5
+  SOCCER_HASH_RETRY_AFTER = 1
 
   @staticmethod
   def init_app(app):
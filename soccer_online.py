@@ -1,10 +1,14 @@
 #!/usr/bin/env python
+import json
 import os
+import time
 
 from flask_script import Manager, Shell
 
 from app import create_app, db
-from app.models import Role, User
+from app.benchmark import run_benchmarks
+from app.models import PlayerSearchToken, Role, User
+from app.seeding import seed_database
 
 app = create_app(os.getenv('FLASK_CONFIG') or 'default')
 manager = Manager(app)
@@ -39,5 +43,58 @@ def restart_db():
   User.create_admin_user()
 
 
+@manager.command
+def upgrade_db():
+  print('Creating missing tables')
+  db.create_all()
+
+  inspector = db.inspect(db.engine)
+  for table in db.metadata.sorted_tables:
+    indexes = set(i['name'] for i in inspector.get_indexes(table.name))
+    for index in table.indexes:
+      if index.name not in indexes:
+        print('Creating index %s' % index.name)
+        index.create(db.engine)
+
+
+@manager.command
+def rebuild_search_index():
+  print('Rebuilding players search index')
+  PlayerSearchToken.rebuild()
+
+
+@manager.command
+def seed(users=1000, offer_ratio=0.1, seed=None, batch_size=1000):
+  print('Seeding %d users with their teams and players' % int(users))
+  start = time.time()
+  rows = seed_database(int(users), offer_ratio=float(offer_ratio),
+                       seed=None if seed is None else int(seed), batch_size=int(batch_size))
+  elapsed = time.time() - start
+  print('Inserted %d rows in %.1fs (%d rows/s)' % (rows, elapsed, rows / elapsed))
+
+
+@manager.command
+def bench(requests=100, output='bench.json', baseline=None):
+  print('Running benchmarks against %s' % app.config['SQLALCHEMY_DATABASE_URI'])
+  results = run_benchmarks(app, int(requests))
+
+  previous = {}
+  if baseline:
+    with open(baseline) as f:
+      previous = json.load(f)['results']
+
+  for name, result in results.items():
+    line = '%-40s p50 %8.2fms  p95 %8.2fms  p99 %8.2fms  %8.1f req/s' % (
+        name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['rps'])
+    if name in previous:
+      line += '  (p50 %+.1f%%)' % ((result['p50_ms'] / previous[name]['p50_ms'] - 1) * 100)
+    print(line)
+
+  with open(output, 'w') as f:
+    json.dump({'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'requests': int(requests),
+               'results': results}, f, indent=2)
+  print('Results saved to %s' % output)
+
+
 if __name__ == '__main__':
   manager.run()
@@ -3,6 +3,7 @@ import unittest
 
 from app import create_app, db
 from app.models import Role, User
+from flask_sqlalchemy import get_debug_queries
 
 
 class AbstractAPITestCase(unittest.TestCase):
@@ -72,3 +73,19 @@ class AbstractAPITestCase(unittest.TestCase):
     json_response = json.loads(response.data.decode('utf-8'))
 
     return json_response['access_token']
+
+  def count_queries(self, f):
+    queries = len(get_debug_queries())
+    result = f()
+    return result, len(get_debug_queries()) - queries
+
+  def assert_no_full_scan(self, query):
+    sql = str(query.statement.compile(
+        db.engine, compile_kwargs={'literal_binds': True}))
+    if db.engine.dialect.name == 'sqlite':
+      plan = db.session.execute('EXPLAIN QUERY PLAN ' + sql)
+      scans = [row[-1] for row in plan if row[-1].startswith('SCAN')]
+    else:
+      plan = db.session.execute('EXPLAIN ' + sql)
+      scans = [row['table'] for row in plan if row['type'] == 'ALL']
+    self.assertFalse(scans, 'full scan in %s' % sql)
@@ -1,5 +1,11 @@
 import json
+from unittest import mock
 
+from app import db
+from app.caching import CacheError, get_generation
+from app.json_provider import init_json_provider, jsonify
+from app.links import link_for
+from app.models import Player, Role, Team
 from flask import url_for
 
 from abstract_test_api import AbstractAPITestCase
@@ -17,3 +23,280 @@ class APITestCase(AbstractAPITestCase):
     self.assertTrue(response.status_code == 405)
     json_response = json.loads(response.data.decode('utf-8'))
     self.assertTrue(json_response['error'] == 'method not allowed')
+
+  def test_links(self):
+    endpoints = ['api.get_player', 'api.get_team', 'api.get_team_players',
+                 'api.get_user', 'api.get_user_team', 'api.get_role']
+    for base_url in ['http://localhost/', 'https://example.com:8443/soccer/']:
+      with self.app.test_request_context('/', base_url=base_url):
+        for endpoint in endpoints:
+          for id in [1, 42, 9876543210, 10**12]:
+            self.assertTrue(link_for(endpoint, id) ==
+                            url_for(endpoint, id=id, _external=True))
+
+  def test_json_encoders(self):
+    data = [{'name': 'Peter', 'lastname': 'Müller', 'value': 1000000.5, 'id': 1},
+            {'name': 'Sam', 'team': None, 'offer': True}]
+    for debug in [False, True]:
+      self.app.debug = debug
+      responses = []
+      for encoder in ['json', 'orjson']:
+        self.app.config['SOCCER_JSON_ENCODER'] = encoder
+        init_json_provider(self.app)
+        with self.app.test_request_context('/'):
+          responses.append(jsonify(data))
+      self.assertTrue(responses[0].mimetype == responses[1].mimetype)
+      self.assertTrue(json.loads(responses[0].data.decode('utf-8')) ==
+                      json.loads(responses[1].data.decode('utf-8')) == data)
+
+  def test_streaming(self):
+    t_user = self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+    for i in range(3):
+      team = Team(name='team_%d' % i, country='Spain', wallet=0)
+      if i == 0:
+        team.user = t_user
+      for j in range(i + 1):
+        team.players.append(Player(name='Peter', lastname='Smith', country='Spain', value=1000000,
+                                   age=23, position='Defender', offer=j % 2 == 0, price=1500000))
+      db.session.add(team)
+    db.session.commit()
+    self.app.config['SOCCER_STREAM_CHUNK_SIZE'] = 2
+
+    for endpoint, query_string in [('api.get_players', {'limit': 4}),
+                                   ('api.get_teams', {}),
+                                   ('api.get_users', {}),
+                                   ('api.get_players_market', {})]:
+      responses = []
+      for stream in [False, True]:
+        self.app.config['SOCCER_STREAM_RESPONSES'] = stream
+        response = self.client.get(
+            url_for(endpoint),
+            query_string=query_string,
+            headers=self.get_api_headers(jwt_token)
+        )
+        self.assertTrue(response.status_code == 200)
+        responses.append(response)
+      self.assertTrue(responses[1].is_streamed)
+      self.assertTrue(responses[0].headers.get('Link') ==
+                      responses[1].headers.get('Link'))
+      self.assertTrue(json.loads(responses[0].data.decode('utf-8')) ==
+                      json.loads(responses[1].data.decode('utf-8')))
+
+  def test_query_stats(self):
+    t_user = self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    response = self.client.get(
+        url_for('api.get_roles'),
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertFalse('X-Query-Count' in response.headers)
+
+    self.app.config['SOCCER_QUERY_STATS'] = True
+    self.app.config['SOCCER_QUERY_COUNT_LIMIT'] = 0
+    with self.assertLogs(self.app.logger, 'WARNING') as logs:
+      response = self.client.get(
+          url_for('api.get_player', id=1),
+          headers=self.get_api_headers(jwt_token)
+      )
+    self.assertTrue(response.status_code == 404)
+    self.assertTrue(int(response.headers['X-Query-Count']) >= 1)
+    self.assertTrue(float(response.headers['X-DB-Time-ms']) >= 0)
+    self.assertTrue('GET /api/players/1: ' in logs.output[0])
+    self.assertTrue('FROM players WHERE players.id = ?' in logs.output[0])
+
+  def test_response_cache_generation(self):
+    team = Team(name='Barcelona', country='Spain', wallet=0)
+    player = Player(name='Peter', lastname='Smith', country='Spain',
+                    value=1000000, age=22, position='Defender')
+    team.players.append(player)
+    db.session.add(team)
+    db.session.commit()
+    self.create_admin_user()
+    jwt_token = self.get_access_token(
+        self.admin_user['username'], self.admin_user['password'])
+    cache = self.app.extensions['response_cache']
+    key = 'api.get_player:%d' % player.id
+
+    # a reader builds a body before a write commits and stores it after the eviction
+    generation = get_generation(cache, key)
+    response = self.client.put(
+        url_for('api.edit_player', id=player.id),
+        data=json.dumps({'name': 'Juan'}),
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 200)
+    cache.set(key, (generation, 'http://localhost/', b'{"name": "Peter"}', 'application/json'))
+
+    response = self.client.get(
+        url_for('api.get_player', id=player.id),
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(json.loads(response.data.decode('utf-8'))['name'] == 'Juan')
+
+    db.session.delete(player)
+    db.session.delete(team)
+    db.session.commit()
+
+  def test_response_cache_errors(self):
+    team = Team(name='Barcelona', country='Spain', wallet=0)
+    player = Player(name='Peter', lastname='Smith', country='Spain',
+                    value=1000000, age=22, position='Defender')
+    team.players.append(player)
+    db.session.add(team)
+    db.session.commit()
+    self.create_admin_user()
+    jwt_token = self.get_access_token(
+        self.admin_user['username'], self.admin_user['password'])
+    cache = self.app.extensions['response_cache']
+
+    # an unavailable cache backend serves uncached responses
+    error = CacheError('connection refused')
+    with mock.patch.object(cache, 'get', side_effect=error), \
+            mock.patch.object(cache, 'set', side_effect=error), \
+            mock.patch.object(cache, 'delete', side_effect=error):
+      response = self.client.get(
+          url_for('api.get_player', id=player.id),
+          headers=self.get_api_headers(jwt_token)
+      )
+      self.assertTrue(response.status_code == 200)
+
+      # committed writes still succeed
+      response = self.client.put(
+          url_for('api.edit_player', id=player.id),
+          data=json.dumps({'name': 'Juan'}),
+          headers=self.get_api_headers(jwt_token)
+      )
+      self.assertTrue(response.status_code == 200)
+    self.assertTrue(player.name == 'Juan')
+
+    db.session.delete(player)
+    db.session.delete(team)
+    db.session.commit()
+
+  def test_role_registry(self):
+    self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    def get_roles():
+      return self.count_queries(lambda: self.client.get(
+          url_for('api.get_roles'),
+          headers=self.get_api_headers(jwt_token)
+      ))
+
+    # roles are served from memory
+    response, queries = get_roles()
+    self.assertTrue(response.status_code == 200)
+    self.assertTrue(queries == 0)
+    roles = json.loads(response.data.decode('utf-8'))
+    self.assertTrue([r['name'] for r in roles] == ['Administrator', 'User'])
+    self.assertTrue(Role.registry().default().name == 'User')
+    self.assertTrue(Role.registry().get_by_name('Administrator').administrator)
+
+    # changing a role reloads the registry
+    role = Role.query.filter_by(name='User').first()
+    role.name = 'Manager'
+    db.session.flush()
+    self.assertTrue(Role.registry().get(role.id).name == 'User')
+    db.session.commit()
+    response, queries = get_roles()
+    roles = json.loads(response.data.decode('utf-8'))
+    self.assertTrue([r['name'] for r in roles] == ['Administrator', 'Manager'])
+    self.assertTrue(queries == 1)
+
+  def test_metrics(self):
+    self.create_test_user()
+    self.create_admin_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    # try to read metrics without being administrator
+    response = self.client.get(
+        url_for('api.get_metrics'),
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 403)
+
+    jwt_token = self.get_access_token(
+        self.admin_user['username'], self.admin_user['password'])
+    self.client.get(url_for('api.get_roles'),
+                    headers=self.get_api_headers(jwt_token))
+    response = self.client.get(
+        url_for('api.get_metrics'),
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 200)
+    self.assertTrue(response.content_type.startswith('text/plain'))
+    metrics = response.data.decode('utf-8')
+    self.assertTrue(
+        'soccer_http_requests_total{endpoint="api.get_metrics",method="GET",status="403"}' in metrics)
+    self.assertTrue(
+        'soccer_http_request_duration_seconds_count{endpoint="api.get_roles",method="GET"}' in metrics)
+    self.assertTrue(
+        'soccer_http_request_queries_bucket{endpoint="api.get_roles",le="1.0"}' in metrics)
+    self.assertTrue(
+        'soccer_password_hash_duration_seconds_count{operation="check"}' in metrics)
+
+  def test_response_cache(self):
+    team = Team(name='Barcelona', country='Spain', wallet=0)
+    player = Player(name='Peter', lastname='Smith', country='Spain',
+                    value=1000000, age=22, position='Defender')
+    team.players.append(player)
+    db.session.add(team)
+    db.session.commit()
+    self.create_admin_user()
+    jwt_token = self.get_access_token(
+        self.admin_user['username'], self.admin_user['password'])
+    cache = self.app.extensions['response_cache']
+
+    def get(endpoint, **kwargs):
+      db.session.expire_all()
+      return self.count_queries(lambda: self.client.get(
+          url_for(endpoint, **kwargs),
+          headers=self.get_api_headers(jwt_token)
+      ))
+
+    response, queries = get('api.get_player', id=player.id)
+    cached_response, cached_queries = get('api.get_player', id=player.id)
+    self.assertTrue(cached_response.data == response.data)
+    self.assertTrue(cached_queries < queries)
+    get('api.get_team', id=team.id)
+    get('api.get_team_players', id=team.id)
+
+    # editing a player evicts the player and its team
+    response = self.client.put(
+        url_for('api.edit_player', id=player.id),
+        data=json.dumps({'name': 'Juan', 'value': 2000000}),
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 200)
+    self.assertIsNone(cache.get('api.get_player:%d' % player.id))
+    self.assertIsNone(cache.get('api.get_team:%d' % team.id))
+    self.assertIsNone(cache.get('api.get_team_players:%d' % team.id))
+    response, _ = get('api.get_player', id=player.id)
+    self.assertTrue(json.loads(response.data.decode('utf-8'))['name'] == 'Juan')
+    response, _ = get('api.get_team', id=team.id)
+    self.assertTrue(json.loads(response.data.decode('utf-8'))['value'] == 2000000)
+
+    # deleting a team evicts its players
+    get('api.get_player', id=player.id)
+    response = self.client.delete(
+        url_for('api.delete_team', id=team.id),
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 204)
+    response, _ = get('api.get_player', id=player.id)
+    self.assertFalse('team' in json.loads(response.data.decode('utf-8')))
+    response, _ = get('api.get_team', id=team.id)
+    self.assertTrue(response.status_code == 404)
+
+    # rolled back changes don't evict anything
+    get('api.get_player', id=player.id)
+    player.name = 'Pedro'
+    db.session.flush()
+    db.session.rollback()
+    self.assertIsNotNone(cache.get('api.get_player:%d' % player.id))
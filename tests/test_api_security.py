@@ -1,6 +1,13 @@
 import json
+from unittest import mock
+
+import jwt
 
 from app import db
+from app.authentication import Identity, identity
+from app.caching import get_generation
+from app.hashing import PasswordHasher
+from app.models import Player, PlayerSearchToken, Team, User
 from flask import url_for
 
 from abstract_test_api import AbstractAPITestCase
@@ -62,6 +69,210 @@ class APISecurityTestCase(AbstractAPITestCase):
     db.session.delete(t_user)
     db.session.commit()
 
+  def test_identity_cache(self):
+    t_user = self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+    cache = self.app.extensions['identity_cache']
+
+    def edit_user():
+      db.session.expire_all()
+      return self.client.put(
+          url_for('api.edit_user', id=t_user.id),
+          data=json.dumps({}),
+          headers=self.get_api_headers(jwt_token)
+      )
+
+    # issuing the token already cached the identity
+    self.assertIsNotNone(cache.get(t_user.id))
+    cache.delete(t_user.id)
+    response, queries = self.count_queries(edit_user)
+    self.assertTrue(response.status_code == 200)
+    self.assertIsNone(cache.get(t_user.id)[1].team_id)
+
+    # cached identity doesn't hit the database
+    response, cached_queries = self.count_queries(edit_user)
+    self.assertTrue(response.status_code == 200)
+    self.assertTrue(cached_queries == queries - 1)
+
+    # changing team's owner invalidates cached identity
+    team = Team(name='new_team', country='Spain', wallet=0, user=t_user)
+    db.session.add(team)
+    db.session.flush()
+    self.assertIsNotNone(cache.get(t_user.id))
+    db.session.commit()
+    self.assertIsNone(cache.get(t_user.id))
+
+    response = edit_user()
+    self.assertTrue(response.status_code == 200)
+    self.assertTrue(cache.get(t_user.id)[1].team_id == team.id)
+
+    # an identity loaded before a concurrent invalidation is never served
+    generation = get_generation(cache, t_user.id)
+    team.user = None
+    db.session.commit()
+    cache.set(t_user.id, (generation, Identity(t_user.id, False, team.id)))
+    self.assertIsNone(identity({'identity': t_user.id}).team_id)
+
+    db.session.delete(team)
+    db.session.delete(t_user)
+    db.session.commit()
+    self.assertIsNone(cache.get(t_user.id))
+
+  def test_jwt_claims(self):
+    t_user = self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+    payload = jwt.decode(jwt_token, verify=False)
+    self.assertFalse(payload['administrator'])
+    self.assertIsNone(payload['team_id'])
+
+    def get_roles():
+      return self.client.get(
+          url_for('api.get_roles'),
+          headers=self.get_api_headers(jwt_token)
+      )
+
+    # read only endpoints authorize from the token claims
+    cache = self.app.extensions['identity_cache']
+    cache.delete(t_user.id)
+    response = get_roles()
+    self.assertTrue(response.status_code == 200)
+    self.assertIsNone(cache.get(t_user.id))
+
+    # changing the team owner revokes the claims, falling back to the database
+    team = Team(name='new_team', country='Spain', wallet=0, user=t_user)
+    db.session.add(team)
+    db.session.commit()
+    response = get_roles()
+    self.assertTrue(response.status_code == 200)
+    self.assertTrue(cache.get(t_user.id)[1].team_id == team.id)
+
+    # new tokens carry the new claims
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+    self.assertTrue(jwt.decode(jwt_token, verify=False)['team_id'] == team.id)
+
+    # deleted users are rejected
+    db.session.delete(team)
+    db.session.delete(t_user)
+    db.session.commit()
+    response = get_roles()
+    self.assertTrue(response.status_code == 401)
+
+  def test_revocation_list(self):
+    t_user = self.create_test_user()
+    team = Team(name='new_team', country='Spain', wallet=0, user=t_user)
+    db.session.add(team)
+    db.session.commit()
+    revocations = self.app.extensions['revoked_claims']
+    revocations.cache.delete('revoked:%d' % t_user.id)
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+    cache = self.app.extensions['identity_cache']
+
+    def get_roles():
+      cache.delete(t_user.id)
+      response = self.client.get(
+          url_for('api.get_roles'),
+          headers=self.get_api_headers(jwt_token)
+      )
+      self.assertTrue(response.status_code == 200)
+      # identities are only cached by the database check
+      return cache.get(t_user.id) is None
+
+    # wallet changes keep the claims
+    team.wallet = 1000
+    db.session.commit()
+    self.assertIsNone(revocations.cache.get('revoked:%d' % t_user.id))
+    self.assertTrue(get_roles())
+
+    # a full list never drops revocations, older tokens use the database instead
+    revocations.cache.size = len(revocations.cache.entries)
+    other = Team(name='other_team', country='Spain', wallet=0, user=self.create_admin_user())
+    db.session.add(other)
+    db.session.commit()
+    self.assertIsNotNone(revocations.overflow)
+    self.assertFalse(get_roles())
+
+    db.session.delete(other)
+    db.session.delete(team)
+    db.session.delete(t_user)
+    db.session.commit()
+
+  def test_password_hasher_admission(self):
+    t_user = self.create_test_user()
+    hasher = PasswordHasher(1, 0, 0, 3)
+    self.app.extensions['password_hasher'] = hasher
+
+    def authenticate():
+      return self.client.post(
+          self.app.config['JWT_AUTH_URL_RULE'],
+          data=json.dumps({'username': self.test_user['username'],
+                           'password': self.test_user['password']}),
+          headers=self.get_api_headers()
+      )
+
+    # saturated pool rejects new hashing jobs
+    self.assertTrue(hasher.slots.acquire(blocking=False))
+    response = authenticate()
+    self.assertTrue(response.status_code == 503)
+    self.assertTrue(response.headers['Retry-After'] == '3')
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue(json_response['error'] == 'service unavailable')
+
+    hasher.slots.release()
+    response = authenticate()
+    self.assertTrue(response.status_code == 200)
+
+    hasher.executor.shutdown()
+    db.session.delete(t_user)
+    db.session.commit()
+
+  def test_credential_cache(self):
+    t_user = self.create_test_user()
+
+    def authenticate(password):
+      return self.client.post(
+          self.app.config['JWT_AUTH_URL_RULE'],
+          data=json.dumps({'username': self.test_user['username'],
+                           'password': password}),
+          headers=self.get_api_headers()
+      )
+
+    with mock.patch.object(User, 'verify_password', autospec=True,
+                           side_effect=User.verify_password) as verify_password:
+      response = authenticate(self.test_user['password'])
+      self.assertTrue(response.status_code == 200)
+      jwt_token = json.loads(response.data.decode('utf-8'))['access_token']
+
+      # verified credentials skip the password hash check
+      response = authenticate(self.test_user['password'])
+      self.assertTrue(response.status_code == 200)
+      self.assertTrue(verify_password.call_count == 1)
+
+      # wrong passwords are always checked
+      response = authenticate('wrong_password')
+      self.assertTrue(response.status_code == 401)
+      self.assertTrue(verify_password.call_count == 2)
+
+    # changing the password invalidates cached credentials
+    response = self.client.put(
+        url_for('api.edit_user', id=t_user.id),
+        data=json.dumps({'password': 'new_password'}),
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 200)
+    self.assertIsNone(self.app.extensions['credential_cache'].get(t_user.id))
+
+    response = authenticate(self.test_user['password'])
+    self.assertTrue(response.status_code == 401)
+    response = authenticate('new_password')
+    self.assertTrue(response.status_code == 200)
+
+    db.session.delete(t_user)
+    db.session.commit()
+
   def test_user_registration(self):
     # try to register new user without email
     response = self.client.post(
@@ -152,3 +363,7 @@ class APISecurityTestCase(AbstractAPITestCase):
     self.assertTrue(len(user_players) == 20)
     for p in user_players:
       self.assertTrue(p['value'] == 1000000)
+      player = Player.query.get(p['id'])
+      self.assertFalse(player.offer)
+      self.assertTrue(PlayerSearchToken.query.filter_by(
+          player_id=player.id).count() > 0)
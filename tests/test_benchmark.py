@@ -0,0 +1,27 @@
+from app import db
+from app.benchmark import run_benchmarks
+from app.models import Player, Team
+
+from abstract_test_api import AbstractAPITestCase
+
+
+class BenchmarkTestCase(AbstractAPITestCase):
+  def test_run_benchmarks(self):
+    team = Team(name='Barcelona', country='Spain', wallet=1000000)
+    for _ in range(3):
+      team.players.append(Player(name='Peter', lastname='Smith', country='Spain', value=1000000,
+                                 price=1500000, age=22, offer=True, position='Defender'))
+    db.session.add(team)
+    db.session.commit()
+    self.app_context.pop()
+
+    results = run_benchmarks(self.app, requests=3)
+
+    self.app_context.push()
+    self.assertTrue(len(results) == 9)
+    for name, result in results.items():
+      self.assertTrue(result['requests'] == 3)
+      self.assertTrue(result['errors'] == 0, name)
+      self.assertTrue(result['p50_ms'] <= result['p95_ms'] <= result['p99_ms'])
+      self.assertTrue(result['rps'] > 0)
+    self.assertTrue(Player.query.filter_by(offer=True).count() == 0)
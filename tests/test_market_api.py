@@ -1,8 +1,11 @@
 import json
+from unittest import mock
 
-from app import db
-from app.models import Player, Team
+from app import db, transfers
+from app.api.players import get_market_query
+from app.models import Player, PlayerSearchToken, Team, Version
 from flask import url_for
+from sqlalchemy.exc import OperationalError
 
 from abstract_test_api import AbstractAPITestCase
 
@@ -83,6 +86,78 @@ class MarketAPITestCase(AbstractAPITestCase):
     db.session.delete(pl3)
     db.session.commit()
 
+  def test_search_players_market(self):
+    pl1 = Player(name='Peter', lastname='Smith', country='Spain',
+                 value=1000000, price=1000100, age=22, offer=True, position='Defender')
+    pl2 = Player(name='Sam', lastname='Petersen', country='Spain',
+                 value=1000000, price=1000100, age=22, offer=True, position='Defender')
+    pl3 = Player(name='Sam', lastname='Carter', country='Spain',
+                 value=1000000, price=1000100, age=22, offer=True, position='Defender')
+    db.session.add_all([pl1, pl2, pl3])
+    db.session.commit()
+
+    t_user = self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    def search(name):
+      response = self.client.get(
+          url_for('api.get_players_market'),
+          query_string={'name': name},
+          headers=self.get_api_headers(jwt_token)
+      )
+      self.assertTrue(response.status_code == 200)
+      json_response = json.loads(response.data.decode('utf-8'))
+      return sorted(p['id'] for p in json_response)
+
+    self.assertTrue(search('PETER') == [pl1.id, pl2.id])
+    self.assertTrue(search('eter') == [pl1.id, pl2.id])
+    self.assertTrue(search('sam') == [pl2.id, pl3.id])
+    self.assertTrue(search('te') == [pl1.id, pl2.id, pl3.id])
+    self.assertTrue(search('p%r') == [pl1.id, pl2.id])
+    self.assertTrue(search('sam carter') == [])
+
+    # index follows player updates
+    pl3.lastname = 'Peterson'
+    db.session.commit()
+    self.assertTrue(search('peter') == [pl1.id, pl2.id, pl3.id])
+    self.assertTrue(search('carter') == [])
+
+    # index follows player deletion
+    db.session.delete(pl1)
+    db.session.commit()
+    self.assertTrue(search('peter') == [pl2.id, pl3.id])
+    self.assertTrue(PlayerSearchToken.query.filter_by(
+        player_id=pl1.id).count() == 0)
+
+    # index can be rebuilt from players table
+    PlayerSearchToken.rebuild(batch_size=1)
+    self.assertTrue(search('peter') == [pl2.id, pl3.id])
+    self.assertTrue(search('sam') == [pl2.id, pl3.id])
+
+    db.session.delete(pl2)
+    db.session.delete(pl3)
+    db.session.delete(t_user)
+    db.session.commit()
+
+  def test_market_query_plans(self):
+    team = Team(name='Barcelona', country='Spain', wallet=1000000)
+    team.players.append(Player(name='Peter', lastname='Smith', country='Spain',
+                               value=1000000, price=1000100, age=22, offer=True, position='Defender'))
+    db.session.add(team)
+    db.session.commit()
+
+    for args in [{},
+                 {'team': 'Barcelona'},
+                 {'country': 'Spain'},
+                 {'name': 'peter'},
+                 {'minPrice': 1000000},
+                 {'maxPrice': 2000000},
+                 {'minPrice': 1000000, 'maxPrice': 2000000},
+                 {'country': 'Spain', 'minPrice': 1000000, 'maxPrice': 2000000},
+                 {'team': 'Barcelona', 'name': 'peter', 'maxPrice': 2000000}]:
+      self.assert_no_full_scan(get_market_query(args))
+
   def test_offer_player(self):
     player = Player(name='Peter', lastname='Smith',
                     country='Spain', value=1000000, age=22, position='Defender')
@@ -270,3 +345,245 @@ class MarketAPITestCase(AbstractAPITestCase):
     db.session.delete(t1)
     db.session.delete(t2)
     db.session.delete(t_user)
+
+  def test_buy_player_retry(self):
+    player = Player(name='Peter', lastname='Smith', country='Spain',
+                    value=1000000, age=22, price=1000100, offer=True, position='Attacker')
+    t1 = Team(name='Barcelona', country='Spain', wallet=1000000)
+    t1.players.append(player)
+    db.session.add(t1)
+    db.session.commit()
+
+    t_user = self.create_test_user()
+    t2 = Team(name='Real Madrid', country='Spain', wallet=2000000, user=t_user)
+    db.session.add(t2)
+    db.session.commit()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    # first attempt deadlocks, the second one succeeds
+    buy_player = transfers._buy_player
+    attempts = []
+
+    def deadlock_once(*args):
+      attempts.append(args)
+      if len(attempts) == 1:
+        raise OperationalError('SELECT', {}, Exception(1213, 'Deadlock found'))
+      return buy_player(*args)
+
+    with mock.patch.object(transfers, '_buy_player', deadlock_once):
+      response = self.client.post(
+          url_for('api.buy_player', id=player.id),
+          headers=self.get_api_headers(jwt_token)
+      )
+    self.assertTrue(response.status_code == 204)
+    self.assertTrue(len(attempts) == 2)
+    self.assertTrue(t2.wallet == 2000000 - player.price)
+    self.assertTrue(player.team_id == t2.id)
+
+    # a sold player cannot be bought twice
+    response = self.client.post(
+        url_for('api.buy_player', id=player.id),
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 400)
+
+    db.session.delete(player)
+    db.session.delete(t1)
+    db.session.delete(t2)
+    db.session.delete(t_user)
+    db.session.commit()
+
+  def test_buy_players(self):
+    pl1 = Player(name='Peter', lastname='Smith', country='Spain',
+                 value=1000000, age=22, price=1000000, offer=True, position='Attacker')
+    pl2 = Player(name='Sam', lastname='Reynolds', country='Spain',
+                 value=1000000, age=18, price=1000000, position='Defender')
+    pl3 = Player(name='Peter', lastname='Carter', country='Germany',
+                 value=1000000, age=32, price=2000000, offer=True, position='Goalkeeper')
+    t1 = Team(name='Barcelona', country='Spain', wallet=0)
+    t1.players.append(pl1)
+    t1.players.append(pl2)
+    t3 = Team(name='Bayern', country='Germany', wallet=0)
+    t3.players.append(pl3)
+    t_user = self.create_test_user()
+    t2 = Team(name='Real Madrid', country='Spain', wallet=2500000, user=t_user)
+    db.session.add_all([t1, t2, t3])
+    db.session.commit()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    def buy(player_ids):
+      return self.client.post(
+          url_for('api.buy_players'),
+          data=json.dumps({'players': player_ids}),
+          headers=self.get_api_headers(jwt_token)
+      )
+
+    # try to buy an empty list
+    response = buy([])
+    self.assertTrue(response.status_code == 400)
+
+    # try to buy players without enough money for all of them
+    response = buy([pl3.id, pl1.id])
+    self.assertTrue(response.status_code == 400)
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue(json_response['description']
+                    == 'you don\'t have enough money to buy these players')
+    self.assertTrue(t2.wallet == 2500000)
+    self.assertTrue(pl1.offer and pl3.offer)
+
+    t2.wallet = 3500000
+    db.session.commit()
+
+    # buy players, unavailable ones are reported
+    response = buy([pl3.id, pl1.id, pl2.id, 999999, pl1.id])
+    self.assertTrue(response.status_code == 200)
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue(json_response == [
+        {'id': pl3.id, 'bought': True},
+        {'id': pl1.id, 'bought': True},
+        {'id': pl2.id, 'bought': False, 'error': 'player is not in market'},
+        {'id': 999999, 'bought': False, 'error': 'player not found'}])
+    self.assertTrue(t2.wallet == 500000)
+    self.assertTrue(t1.wallet == 1000000)
+    self.assertTrue(t3.wallet == 2000000)
+    self.assertTrue(pl1.team_id == t2.id and pl3.team_id == t2.id)
+    self.assertFalse(pl1.offer or pl3.offer)
+    self.assertTrue(pl1.value >= 1100000)
+
+    for obj in (pl1, pl2, pl3, t1, t2, t3, t_user):
+      db.session.delete(obj)
+    db.session.commit()
+
+  def test_buy_player_version_error(self):
+    player = Player(name='Peter', lastname='Smith', country='Spain',
+                    value=1000000, age=22, price=1000100, offer=True, position='Attacker')
+    t1 = Team(name='Barcelona', country='Spain', wallet=0)
+    t1.players.append(player)
+    t_user = self.create_test_user()
+    t2 = Team(name='Real Madrid', country='Spain', wallet=2000000, user=t_user)
+    db.session.add_all([t1, t2])
+    db.session.commit()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+    version = Version.get('team:%d' % t2.id)
+
+    def buy():
+      return self.client.post(
+          url_for('api.buy_player', id=player.id),
+          headers=self.get_api_headers(jwt_token)
+      )
+
+    # version counters are bumped in the purchase transaction
+    error = OperationalError('UPDATE', {}, Exception('disk I/O error'))
+    with mock.patch.object(Version, 'bump', side_effect=error):
+      response = buy()
+    self.assertTrue(response.status_code == 500)
+    self.assertTrue(player.team_id == t1.id)
+    self.assertTrue(t2.wallet == 2000000)
+
+    # a locked counter retries the whole purchase
+    bump = Version.bump
+    calls = []
+
+    def locked_once(*args):
+      calls.append(args)
+      if len(calls) == 1:
+        raise OperationalError('UPDATE', {}, Exception('database is locked'))
+      return bump(*args)
+
+    with mock.patch.object(Version, 'bump', side_effect=locked_once):
+      response = buy()
+    self.assertTrue(response.status_code == 204)
+    self.assertTrue(len(calls) == 2)
+    self.assertTrue(player.team_id == t2.id)
+    self.assertTrue(Version.get('team:%d' % t2.id) == version + 1)
+
+    for obj in (player, t1, t2, t_user):
+      db.session.delete(obj)
+    db.session.commit()
+
+  def test_team_players_cache_version(self):
+    player = Player(name='Peter', lastname='Smith', country='Spain',
+                    value=1000000, age=22, position='Attacker')
+    team = Team(name='Barcelona', country='Spain', wallet=0)
+    team.players.append(player)
+    db.session.add(team)
+    db.session.commit()
+    self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    def get():
+      return self.client.get(
+          url_for('api.get_team_players', id=team.id),
+          headers=self.get_api_headers(jwt_token)
+      )
+
+    response = get()
+    self.assertTrue(response.status_code == 200)
+    etag = response.headers['ETag']
+
+    # a cached body is only served with the version it was built under
+    db.session.execute(Player.__table__.update().where(
+        Player.__table__.c.id == player.id).values(name='Juan'))
+    Version.bump(['team:%d' % team.id])
+    db.session.commit()
+    response = get()
+    self.assertTrue(response.headers['ETag'] != etag)
+    self.assertTrue(json.loads(response.data.decode('utf-8'))[0]['name'] == 'Juan')
+
+    db.session.delete(player)
+    db.session.delete(team)
+    db.session.commit()
+
+  def test_market_etag(self):
+    player = Player(name='Peter', lastname='Smith', country='Spain',
+                    value=1000000, price=1000100, age=22, offer=True, position='Defender')
+    team = Team(name='Barcelona', country='Spain', wallet=1000000)
+    team.players.append(player)
+    db.session.add(team)
+    db.session.commit()
+
+    t_user = self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    def get(endpoint, etag=None, **kwargs):
+      headers = self.get_api_headers(jwt_token)
+      if etag:
+        headers['If-None-Match'] = etag
+      return self.client.get(url_for(endpoint, **kwargs), headers=headers)
+
+    for endpoint, kwargs in [('api.get_players_market', {}),
+                             ('api.get_team_players', {'id': team.id})]:
+      response = get(endpoint, **kwargs)
+      self.assertTrue(response.status_code == 200)
+      etag = response.headers['ETag']
+
+      # unchanged resource is not sent again
+      response = get(endpoint, etag, **kwargs)
+      self.assertTrue(response.status_code == 304)
+      self.assertTrue(response.data == b'')
+      self.assertTrue(response.headers['ETag'] == etag)
+
+      # changing a player changes the tag
+      player.lastname = 'Smith ' + endpoint
+      db.session.commit()
+      response = get(endpoint, etag, **kwargs)
+      self.assertTrue(response.status_code == 200)
+      self.assertTrue(response.headers['ETag'] != etag)
+
+    # team's wallet doesn't change the market
+    etag = get('api.get_players_market').headers['ETag']
+    team.wallet = 0
+    db.session.commit()
+    self.assertTrue(get('api.get_players_market', etag).status_code == 304)
+
+    # players leaving the market change it
+    player.offer = False
+    db.session.commit()
+    response = get('api.get_players_market', etag)
+    self.assertTrue(response.status_code == 200)
+    self.assertTrue(json.loads(response.data.decode('utf-8')) == [])
@@ -345,3 +345,53 @@ class PlayerAPITestCase(AbstractAPITestCase):
     db.session.delete(a_user)
     db.session.delete(t_user)
     db.session.commit()
+
+  def test_get_players(self):
+    players = [Player(name='Peter', lastname='Smith', country='Argelia',
+                      value=1000000, age=23, position='Defender') for _ in range(5)]
+    db.session.add_all(players)
+    db.session.commit()
+
+    t_user = self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    # request first page
+    response = self.client.get(
+        url_for('api.get_players'),
+        query_string={'limit': 2},
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 200)
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue([p['id'] for p in json_response] ==
+                    [players[0].id, players[1].id])
+    self.assertTrue(response.headers['Link'] == '<%s>; rel="next"' % url_for(
+        'api.get_players', after=players[1].id, limit=2, _external=True))
+
+    # request last page
+    response = self.client.get(
+        url_for('api.get_players'),
+        query_string={'after': players[3].id, 'limit': 2},
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 200)
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue([p['id'] for p in json_response] == [players[4].id])
+    self.assertFalse('Link' in response.headers)
+
+    # page size is capped by the server
+    self.app.config['SOCCER_MAX_PAGE_SIZE'] = 3
+    response = self.client.get(
+        url_for('api.get_players'),
+        query_string={'limit': 1000},
+        headers=self.get_api_headers(jwt_token)
+    )
+    self.assertTrue(response.status_code == 200)
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue(len(json_response) == 3)
+
+    for p in players:
+      db.session.delete(p)
+    db.session.delete(t_user)
+    db.session.commit()
@@ -0,0 +1,40 @@
+from app import db
+from app.models import Player, PlayerSearchToken, Team, User
+from app.seeding import seed_database
+from app.utils import np
+
+from abstract_test_api import AbstractAPITestCase
+
+
+class SeedingTestCase(AbstractAPITestCase):
+  def test_seed_database(self):
+    if np is None:
+      self.skipTest('numpy is not installed')
+    a_user = self.create_admin_user()
+
+    rows = seed_database(25, offer_ratio=0.5, seed=1, batch_size=10)
+    self.assertTrue(User.query.count() == 26)
+    self.assertTrue(Team.query.count() == 25)
+    self.assertTrue(Player.query.count() == 500)
+    self.assertTrue(rows == 25 + 25 + 500 + PlayerSearchToken.query.count())
+
+    offered = Player.query.filter_by(offer=True).all()
+    self.assertTrue(100 < len(offered) < 400)
+    for p in offered:
+      self.assertTrue(p.value <= p.price <= 2 * p.value)
+    for t in Team.query.all():
+      self.assertTrue(len(t.players) == 20)
+      self.assertTrue(t.user.verify_password('pass1234'))
+
+    # seeded users can log in
+    self.get_access_token('seed_user_2@example.com', 'pass1234')
+
+    # same seed generates same data
+    names = [p.name for p in Player.query.order_by(Player.id)]
+    PlayerSearchToken.query.delete()
+    Player.query.delete()
+    Team.query.delete()
+    User.query.filter(User.id != a_user.id).delete()
+    db.session.commit()
+    seed_database(25, offer_ratio=0.5, seed=1, batch_size=10)
+    self.assertTrue([p.name for p in Player.query.order_by(Player.id)] == names)
@@ -1,7 +1,7 @@
 import json
 
 from app import db
-from app.models import Team
+from app.models import Player, Team
 from flask import url_for
 
 from abstract_test_api import AbstractAPITestCase
@@ -295,3 +295,49 @@ class TeamAPITestCase(AbstractAPITestCase):
     db.session.delete(a_user)
     db.session.delete(t_user)
     db.session.commit()
+
+  def test_get_teams(self):
+    def add_teams(qty):
+      for i in range(qty):
+        team = Team(name='team_%d' % i, country='Spain', wallet=0)
+        for _ in range(3):
+          team.players.append(Player(name='Peter', lastname='Smith', country='Spain',
+                                     value=1000000, age=23, position='Defender'))
+        db.session.add(team)
+      db.session.commit()
+
+    t_user = self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    add_teams(2)
+    # warm up identity cache
+    self.client.get(url_for('api.get_teams'), headers=self.get_api_headers(jwt_token))
+
+    response, queries = self.count_queries(lambda: self.client.get(
+        url_for('api.get_teams'),
+        headers=self.get_api_headers(jwt_token)
+    ))
+    self.assertTrue(response.status_code == 200)
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue(len(json_response) == 2)
+    for t in json_response:
+      self.assertTrue(t['value'] == 3000000)
+
+    # listing more teams doesn't run more queries
+    add_teams(5)
+    response, more_queries = self.count_queries(lambda: self.client.get(
+        url_for('api.get_teams'),
+        headers=self.get_api_headers(jwt_token)
+    ))
+    self.assertTrue(response.status_code == 200)
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue(len(json_response) == 7)
+    self.assertTrue(more_queries == queries)
+
+    for t in Team.query.all():
+      for p in t.players:
+        db.session.delete(p)
+      db.session.delete(t)
+    db.session.delete(t_user)
+    db.session.commit()
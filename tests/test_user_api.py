@@ -2,6 +2,7 @@ import json
 
 import jwt
 from app import db
+from app.models import Role, Team, User
 from flask import url_for
 
 from abstract_test_api import AbstractAPITestCase
@@ -213,3 +214,54 @@ class UserAPITestCase(AbstractAPITestCase):
 
     db.session.delete(a_user)
     db.session.commit()
+
+  def test_get_users(self):
+    role_user = Role.query.filter_by(name='User').first()
+
+    def add_users(qty):
+      for i in range(qty):
+        user = User(email='user_%d_%d@example.com' % (qty, i),
+                    password_hash='-', role_id=role_user.id)
+        if i % 2:
+          user.team = Team(name='team', country='Spain', wallet=0)
+        db.session.add(user)
+      db.session.commit()
+
+    t_user = self.create_test_user()
+    jwt_token = self.get_access_token(
+        self.test_user['username'], self.test_user['password'])
+
+    add_users(2)
+    # warm up identity cache
+    self.client.get(url_for('api.get_users'), headers=self.get_api_headers(jwt_token))
+
+    response, queries = self.count_queries(lambda: self.client.get(
+        url_for('api.get_users'),
+        headers=self.get_api_headers(jwt_token)
+    ))
+    self.assertTrue(response.status_code == 200)
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue(len(json_response) == 3)
+    self.assertTrue(len([u for u in json_response if 'team' in u]) == 1)
+
+    # listing more users doesn't run more queries
+    add_users(6)
+    response, more_queries = self.count_queries(lambda: self.client.get(
+        url_for('api.get_users'),
+        headers=self.get_api_headers(jwt_token)
+    ))
+    self.assertTrue(response.status_code == 200)
+    json_response = json.loads(response.data.decode('utf-8'))
+    self.assertTrue(len(json_response) == 9)
+    self.assertTrue(len([u for u in json_response if 'team' in u]) == 4)
+    for u in json_response:
+      if 'team' in u:
+        self.assertTrue(u['team'] == url_for(
+            'api.get_user_team', id=u['id'], _external=True))
+    self.assertTrue(more_queries == queries)
+
+    for t in Team.query.all():
+      db.session.delete(t)
+    for u in User.query.all():
+      db.session.delete(u)
+    db.session.commit()
@@ -0,0 +1,32 @@
+import unittest
+
+from app.utils import (ALIGNMENT, COUNTRIES, FIRSTNAMES, LASTNAMES,
+                       generate_rosters, np)
+
+
+class UtilsTestCase(unittest.TestCase):
+  @unittest.skipIf(np is None, 'numpy is not installed')
+  def test_generate_rosters(self):
+    teams, players = generate_rosters(50, seed=1)
+    roster_size = sum(qty for qty, _ in ALIGNMENT)
+
+    self.assertTrue(len(teams['country']) == 50)
+    self.assertTrue(set(teams['country']) <= set(COUNTRIES))
+    for column in players.values():
+      self.assertTrue(len(column) == 50 * roster_size)
+
+    self.assertTrue(set(players['name']) <= set(FIRSTNAMES))
+    self.assertTrue(set(players['lastname']) <= set(LASTNAMES))
+    self.assertTrue(set(players['country']) <= set(COUNTRIES))
+    self.assertTrue(players['age'].min() >= 18)
+    self.assertTrue(players['age'].max() <= 40)
+
+    # every team follows the alignment
+    team_positions = players['position'][players['team_index'] == 7].tolist()
+    self.assertTrue(team_positions ==
+                    [pos for qty, pos in ALIGNMENT for _ in range(qty)])
+
+    # same seed generates same rosters
+    same_teams, same_players = generate_rosters(50, seed=1)
+    self.assertTrue((same_players['name'] == players['name']).all())
+    self.assertTrue((same_teams['country'] == teams['country']).all())